@@ -5,7 +5,10 @@ import os
 from motor.motor_asyncio import AsyncIOMotorClient
 import asyncio
 
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27019")
+from caching import bump_version
+from sync import invalidate_syncs
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27019/?directConnection=true")
 DB_NAME = os.getenv("MONGO_DB_NAME", "games_library")
 COLLECTION_NAME = "games"
 
@@ -29,6 +32,11 @@ async def update_games():
     )
     
     print(f"Updated {result.modified_count} documents with new fields.")
+
+    # New library version, so the API's caches and clients' ETags do not outlive the change
+    await bump_version(db["meta"])
+    # The games were changed without a change_seq: clients sync again from since=0
+    await invalidate_syncs(db["meta"])
     print("✅ Migration complete!")
     
     client.close()
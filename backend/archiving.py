@@ -0,0 +1,121 @@
+"""
+Soft deletes and the archive of deleted games.
+
+`deleted` and `is_dlc` are always stored as booleans, so reads filter on `deleted: False` and
+`is_dlc: False` by equality, and the indexes of the read paths only cover live games (see
+indexes.py). A soft-deleted game also gets `deleted_at`. Once that is older than ARCHIVE_AFTER_DAYS
+the archiver moves the game to the games_archive collection, out of the working set for good.
+POST /games/{id}/restore brings a game back from either place.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger("gameslist.archiving")
+
+ARCHIVE_COLLECTION = "games_archive"
+# Days a game stays soft-deleted (and restorable in place) before it is archived
+ARCHIVE_AFTER_DAYS = float(os.getenv("GAMES_ARCHIVE_AFTER_DAYS", "30"))
+# Seconds between archiver runs
+ARCHIVE_INTERVAL = float(os.getenv("GAMES_ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = 500
+
+# Meta document holding the highest change_seq archived: syncs from before it may have missed deletions
+ARCHIVE_DOCUMENT_ID = "archive"
+
+DUPLICATE_KEY = 11000
+
+
+def deletion_fields(deleted):
+    """$set of a change to `deleted`."""
+    return {"deleted": deleted, "deleted_at": datetime.now(timezone.utc) if deleted else None}
+
+
+async def normalize_flags(collection):
+    """Store `deleted` and `is_dlc` on games written without them (scripts, older versions of the API)."""
+    normalized = 0
+    for field in ("deleted", "is_dlc"):
+        result = await collection.update_many({field: {"$nin": [True, False]}}, {"$set": {field: False}})
+        normalized += result.modified_count
+    # Deleted before deletion times were kept: the retention period starts now
+    await collection.update_many(
+        {"deleted": True, "deleted_at": None}, {"$set": {"deleted_at": datetime.now(timezone.utc)}}
+    )
+    return normalized
+
+
+async def archive_deleted(collection, archive_collection, counters, older_than):
+    """Move the games soft-deleted before now - `older_than` to the archive collection."""
+    cutoff = datetime.now(timezone.utc) - older_than
+    archived = 0
+    while True:
+        games = await collection.find(
+            {"deleted": True, "deleted_at": {"$lt": cutoff}}
+        ).limit(ARCHIVE_BATCH_SIZE).to_list(length=ARCHIVE_BATCH_SIZE)
+        if not games:
+            return archived
+        object_ids = [game["_id"] for game in games]
+        try:
+            await archive_collection.insert_many(games, ordered=False)
+        except BulkWriteError as e:
+            # Copies left by a run interrupted before its delete are fine
+            if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+        await collection.delete_many({"_id": {"$in": object_ids}, "deleted": True})
+        # A game restored in the meantime stays live: drop its copy
+        if restored := await collection.distinct("_id", {"_id": {"$in": object_ids}}):
+            await archive_collection.delete_many({"_id": {"$in": restored}})
+        await counters.update_one(
+            {"_id": ARCHIVE_DOCUMENT_ID},
+            {"$max": {"change_seq": max(game.get("change_seq") or 0 for game in games)}},
+            upsert=True,
+        )
+        archived += len(games) - len(restored)
+
+
+async def archived_through(counters):
+    """Highest change_seq of an archived game (0 when nothing was archived)."""
+    doc = await counters.find_one({"_id": ARCHIVE_DOCUMENT_ID})
+    return doc.get("change_seq", 0) if doc else 0
+
+
+async def archive_periodically(collection, archive_collection, counters, retention_days, interval):
+    """Background task: archive the games deleted more than `retention_days` ago, every `interval` seconds."""
+    while True:
+        try:
+            if archived := await archive_deleted(
+                collection, archive_collection, counters, timedelta(days=retention_days)
+            ):
+                logger.info("Archived %d deleted games", archived)
+        except Exception:
+            logger.exception("Archiving deleted games failed")
+        await asyncio.sleep(interval)
+
+
+async def restore_game(collection, archive_collection, object_id, change_seq):
+    """
+    Undelete a game, soft-deleted or archived, stamping it with `change_seq`.
+    Returns the restored document, or None when no deleted game has this _id.
+    """
+    restored_fields = {**deletion_fields(False), "change_seq": change_seq}
+    game = await collection.find_one_and_update(
+        {"_id": object_id, "deleted": True}, {"$set": restored_fields}, return_document=ReturnDocument.AFTER
+    )
+    if game:
+        return game
+
+    archived = await archive_collection.find_one({"_id": object_id})
+    if not archived:
+        return None
+    game = {**archived, **restored_fields}
+    try:
+        await collection.insert_one(game)
+    except DuplicateKeyError:
+        # Restored concurrently
+        return None
+    await archive_collection.delete_one({"_id": object_id})
+    return game
@@ -0,0 +1,143 @@
+"""
+Benchmark: GET /games pages read from Mongo vs from the in-memory replica (memstore.py), for a
+few filter shapes, with `concurrency` requests in flight at a time.
+
+Each side is timed cold and warm. Mongo cold counts the matches on every call; warm takes the total
+from the count cache, as list_games does until the next write. The replica cold selects and sorts
+the matches on every call; warm reuses them, as it does for later pages of a filter.
+
+The last two columns time the whole route, served from the replica: the request goes through the
+ASGI app (middleware, validators, serialization) without a network. "route read" reads the library
+version from Mongo for the validators, as a worker does without a version change stream; "route
+followed" takes it from the one the change stream keeps current.
+
+Usage: python bench_replica.py [rounds] [concurrency]
+Needs the library in MongoDB (MONGO_URL / MONGO_DB_NAME, as migrate_to_mongo.py). Only reads.
+"""
+import asyncio
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import main as api
+from caching import CountCache, read_version
+from main import COLLECTION_NAME, GAME_FIELDS, META_COLLECTION_NAME, build_games_query, score_expression
+from memstore import LibraryReplica
+from search import query_tokens
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27019/?directConnection=true")
+DB_NAME = os.getenv("MONGO_DB_NAME", "games_library")
+LIMIT = 100
+
+CASES = {
+    "all": {},
+    "platform": {"platform": "Steam"},
+    "genre+played": {"genre": "Action", "played": False},
+    "search": {"search": "the"},
+}
+
+
+async def mongo_page(collection, filters, counts=None):
+    """The Mongo reads of list_games (count + page), with the totals of `counts` when given."""
+    query = build_games_query(include_dlc=False, **filters)
+    projection = dict.fromkeys(GAME_FIELDS, 1)
+    tokens = query_tokens(filters.get("search"))
+    total = await (counts.count(collection, query) if counts else collection.count_documents(query))
+    if tokens:
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"_score": score_expression(filters["search"], tokens)}},
+            {"$sort": {"_score": -1, "_id": 1}},
+            {"$limit": LIMIT + 1},
+            {"$project": {**projection, "_score": 1}},
+        ]
+        games = await collection.aggregate(pipeline).to_list(length=LIMIT + 1)
+    else:
+        games = await collection.find(query, projection).sort("_id", 1).limit(LIMIT + 1).to_list(length=LIMIT + 1)
+    return total, games
+
+
+async def memory_page(replica, filters, cold=False):
+    if cold:
+        replica._matches.clear()
+    return replica.page(
+        filters.get("search"), filters.get("platform"), filters.get("genre"), filters.get("played"),
+        False, None, 0, LIMIT,
+    )
+
+
+async def route_page(filters, followed):
+    """GET /games?<filters> through the API's ASGI app."""
+    api.app.version_followed = followed
+    query = {key: str(value).lower() if isinstance(value, bool) else value for key, value in filters.items()}
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/games", "raw_path": b"/games", "root_path": "", "query_string": urlencode(query).encode(),
+        "headers": [], "client": ("bench", 0), "server": ("bench", 80),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await api.app(scope, receive, send)
+    assert status == 200, status
+
+
+async def timed(rounds, concurrency, make_call):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(make_call() for _ in range(concurrency)))
+    return (time.perf_counter() - started) / (rounds * concurrency)
+
+
+async def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    collection = client[DB_NAME][COLLECTION_NAME]
+    replica = LibraryReplica(GAME_FIELDS)
+    started = time.perf_counter()
+    await replica.load(collection)
+    print(f"Loaded {len(replica.games)} games in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    # The API serves from this replica (as with GAMES_MEMORY_REPLICA=1), without running its startup
+    api.app.mongodb = client[DB_NAME]
+    api.replica = replica
+    api.app.library_version, api.app.library_updated_at = await read_version(api.app.mongodb[META_COLLECTION_NAME])
+
+    counts = CountCache()
+    print(
+        f"{'ms per page':>14}  {'mongo cold':>10}  {'mongo warm':>10}  {'memory cold':>11}  {'memory warm':>11}"
+        f"  {'route read':>10}  {'route followed':>14}"
+    )
+    for name, filters in CASES.items():
+        assert (await mongo_page(collection, filters))[0] == (await memory_page(replica, filters))[0], "totals differ"
+        mongo_cold = await timed(rounds, concurrency, lambda: mongo_page(collection, filters))
+        await mongo_page(collection, filters, counts)
+        mongo_warm = await timed(rounds, concurrency, lambda: mongo_page(collection, filters, counts))
+        memory_cold = await timed(rounds, concurrency, lambda: memory_page(replica, filters, cold=True))
+        await memory_page(replica, filters)
+        memory_warm = await timed(rounds, concurrency, lambda: memory_page(replica, filters))
+        route_read = await timed(rounds, concurrency, lambda: route_page(filters, followed=False))
+        route_followed = await timed(rounds, concurrency, lambda: route_page(filters, followed=True))
+        print(
+            f"{name:>14}  {mongo_cold * 1000:10.3f}  {mongo_warm * 1000:10.3f}"
+            f"  {memory_cold * 1000:11.3f}  {memory_warm * 1000:11.3f}"
+            f"  {route_read * 1000:10.3f}  {route_followed * 1000:14.3f}"
+        )
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Microbenchmark: response_model validation vs the fast serialization path (serialization.py)
+for a page of GET /games at 100 and 1000 items.
+
+Usage: python bench_serialization.py [repeat]
+No database needed: the documents are generated, shaped like enriched library entries.
+"""
+import json
+import random
+import sys
+import timeit
+
+from bson import ObjectId
+
+from main import GAME_FIELDS, PaginatedGameResponse, projector
+from serialization import dumps
+
+PLATFORMS = ["Steam", "Epic", "GOG", "Amazon", "Microsoft", "EA"]
+GENRES = ["Action", "Adventure", "RPG", "Strategy", "Indie", "Puzzle", "Simulation", "Platformer"]
+
+
+def make_game(index):
+    return {
+        "_id": ObjectId(),
+        "title": f"Game number {index}",
+        "custom_title": None,
+        "platforms": random.sample(PLATFORMS, 2),
+        "device": ["PC"],
+        "genres": random.sample(GENRES, 3),
+        "notes": "",
+        "played": index % 3 == 0,
+        "rating": random.randint(0, 100),
+        "is_dlc": False,
+        "to_play": False,
+        "to_play_order": None,
+        "description": "An enriched description of the game. " * 12,
+        "release_date": "12 Mar, 2015",
+        "deleted": False,
+        # Internal fields, never part of the response
+        "search_key": f"game number {index}",
+        "search_tokens": ["g", "ga", "gam", "game", "n", "nu", "num", "numb", "numbe", "number"],
+        "random_key": random.random(),
+    }
+
+
+def page(games):
+    return {"items": games, "total": 50000, "skip": 0, "limit": len(games), "next_cursor": None}
+
+
+def validated_path(games):
+    """What FastAPI does for a dict returned from a route with response_model."""
+    model = PaginatedGameResponse.model_validate(page(games))
+    content = model.model_dump(mode="json", by_alias=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(games):
+    project = projector(tuple(GAME_FIELDS))
+    return dumps(page([project(game) for game in games]))
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for size in (100, 1000):
+        games = [make_game(i) for i in range(size)]
+        assert json.loads(validated_path(games)) == json.loads(fast_path(games)), "payloads differ"
+
+        number = max(1, 2000 // size)
+        slow = min(timeit.repeat(lambda: validated_path(games), number=number, repeat=repeat)) / number
+        fast = min(timeit.repeat(lambda: fast_path(games), number=number, repeat=repeat)) / number
+        print(
+            f"{size:>5} items: response_model {slow * 1000:8.3f} ms | fast path {fast * 1000:8.3f} ms"
+            f" | x{slow / fast:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
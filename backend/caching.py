@@ -0,0 +1,201 @@
+"""
+Caching for read endpoints: in-process caches that every mutating route invalidates, and the
+library version document behind the HTTP validators (ETag / Last-Modified) of the read routes.
+
+With several worker processes, a write only invalidates the caches of the worker that handled
+it; `watch_version` lets every other worker notice the version bump and drop its own.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger("gameslist.caching")
+
+COUNT_CACHE_SIZE = int(os.getenv("GAMES_COUNT_CACHE_SIZE", "512"))
+# Upper bound on staleness for writes that bypass the API (migration and enrichment scripts)
+COUNT_CACHE_TTL = float(os.getenv("GAMES_COUNT_CACHE_TTL", "300"))
+# Seconds between reads of the version document when change streams are unavailable (standalone mongod)
+VERSION_POLL_INTERVAL = float(os.getenv("GAMES_VERSION_POLL_INTERVAL", "1"))
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+def canonical_filter(query):
+    """Stable string form of a Mongo filter: same filter, same key, whatever the dict order."""
+    return json.dumps(query, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class CountCache:
+    """LRU of count_documents results keyed by the normalized filter."""
+
+    def __init__(self, max_size=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Bumped on every invalidation, so a count started before a write is never stored after it
+        self._generation = 0
+
+    def get(self, query):
+        key = canonical_filter(query)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        count, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return count
+
+    def set(self, query, count):
+        key = canonical_filter(query)
+        self._entries[key] = (count, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._generation += 1
+        self._entries.clear()
+
+    async def count(self, collection, query):
+        """Cached count_documents."""
+        count = self.get(query)
+        if count is None:
+            generation = self._generation
+            count = await collection.count_documents(query)
+            if generation == self._generation:
+                self.set(query, count)
+        return count
+
+
+# Library version: one document in the meta collection, bumped by every write to the games collection
+VERSION_DOCUMENT_ID = "games"
+
+
+async def read_version(meta_collection):
+    """Current (version, updated_at) of the library; (0, None) before the first write."""
+    doc = await meta_collection.find_one({"_id": VERSION_DOCUMENT_ID})
+    if not doc:
+        return 0, None
+    return doc["version"], doc.get("updated_at")
+
+
+async def bump_version(meta_collection):
+    doc = await meta_collection.find_one_and_update(
+        {"_id": VERSION_DOCUMENT_ID},
+        {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"], doc.get("updated_at")
+
+
+async def watch_version(meta_collection, on_change, poll_interval=VERSION_POLL_INTERVAL, on_following=None):
+    """
+    Background task: await `on_change(version, updated_at)` whenever the library version moves,
+    whichever process bumped it. Follows a change stream on the version document; without a replica
+    set there is none, so it polls the document every `poll_interval` seconds instead. `on_following(True)`
+    is called once the stream is open and caught up (every bump is then reported as it happens), and
+    `on_following(False)` when it is lost.
+    """
+    seen = None
+    use_change_stream = True
+
+    async def check(version, updated_at):
+        nonlocal seen
+        if version != seen:
+            try:
+                await on_change(version, updated_at)
+            except Exception:
+                logger.exception("Version change handler failed")
+        seen = version
+
+    def following(value):
+        if on_following is not None:
+            on_following(value)
+
+    while True:
+        try:
+            if use_change_stream:
+                pipeline = [{"$match": {"documentKey._id": VERSION_DOCUMENT_ID}}]
+                async with meta_collection.watch(pipeline, full_document="updateLookup") as stream:
+                    # Catch up on bumps made while the stream was not open
+                    await check(*await read_version(meta_collection))
+                    following(True)
+                    async for change in stream:
+                        doc = change.get("fullDocument") or {}
+                        await check(doc.get("version", 0), doc.get("updated_at"))
+                following(False)
+            else:
+                await check(*await read_version(meta_collection))
+                await asyncio.sleep(poll_interval)
+        except OperationFailure as e:
+            following(False)
+            if e.code != CHANGE_STREAMS_UNSUPPORTED:
+                logger.warning("Version watch failed, retrying: %s", e)
+                await asyncio.sleep(poll_interval)
+            else:
+                logger.info("No change streams (not a replica set): polling the library version every %ss", poll_interval)
+                use_change_stream = False
+        except PyMongoError as e:
+            following(False)
+            logger.warning("Version watch failed, retrying: %s", e)
+            await asyncio.sleep(poll_interval)
+
+
+def make_etag(*parts):
+    """Weak validator: the same data may be sent with different encodings."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def document_etag(doc):
+    return make_etag(canonical_filter(doc))
+
+
+def validator_headers(etag, last_modified=None):
+    # no-cache: clients may store the response but must revalidate it on every use
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_not_modified(request_headers, etag, last_modified=None):
+    """Evaluate If-None-Match (weak comparison) or, when absent, If-Modified-Since."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        wanted = _opaque(etag)
+        return any(_opaque(tag) == wanted for tag in if_none_match.split(","))
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one second resolution
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+
+def _opaque(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _as_utc(moment):
+    # Mongo hands back naive datetimes that are in UTC
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
@@ -0,0 +1,158 @@
+"""
+Response compression negotiated through Accept-Encoding (brotli when installed, else gzip).
+
+Only complete bodies of compressible types above a minimum size are compressed; streamed
+responses (more than one body message) pass through untouched. Bodies that carry an ETag are
+kept compressed in a small LRU, so an unchanged page is compressed once and not on every request.
+"""
+import gzip
+import os
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MIN_SIZE = int(os.getenv("GAMES_COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GAMES_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("GAMES_BROTLI_QUALITY", "5"))
+CACHE_SIZE = int(os.getenv("GAMES_COMPRESSED_CACHE_SIZE", "128"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def negotiate(accept_encoding):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header, honouring q=0."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    def allowed(encoding):
+        return accepted.get(encoding, accepted.get("*", 0.0)) > 0
+
+    if brotli is not None and allowed("br"):
+        return "br"
+    if allowed("gzip"):
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=MIN_SIZE, cache_size=CACHE_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        encoding = negotiate(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        streaming = False
+
+        async def send_compressed(message):
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                # Hold the headers until we know whether the body is complete
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            if streaming:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # A streamed response: pass it through as is
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+
+            headers = _Headers(start["headers"])
+            if not self._should_compress(start["status"], headers, body):
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self._cached_compress(scope, headers.get("etag"), body, encoding)
+            headers.set("content-encoding", encoding)
+            headers.set("content-length", str(len(compressed)))
+            headers.add_vary("Accept-Encoding")
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, status, headers, body):
+        content_type = headers.get("content-type") or ""
+        return (
+            status == 200
+            and len(body) >= self.minimum_size
+            and headers.get("content-encoding") is None
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _cached_compress(self, scope, etag, body, encoding):
+        if etag is None:
+            return _compress(body, encoding)
+        key = (scope["path"], scope.get("query_string", b""), etag, encoding)
+        if (compressed := self._cache.get(key)) is not None:
+            self._cache.move_to_end(key)
+            return compressed
+        compressed = _compress(body, encoding)
+        self._cache[key] = compressed
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return compressed
+
+
+class _Headers:
+    """Minimal mutable view over ASGI raw headers."""
+
+    def __init__(self, raw):
+        self.raw = list(raw)
+
+    def get(self, name):
+        name = name.encode("latin-1")
+        for key, value in self.raw:
+            if key.lower() == name:
+                return value.decode("latin-1")
+        return None
+
+    def set(self, name, value):
+        encoded = name.encode("latin-1")
+        self.raw = [(k, v) for k, v in self.raw if k.lower() != encoded]
+        self.raw.append((encoded, value.encode("latin-1")))
+
+    def add_vary(self, value):
+        current = self.get("vary")
+        if current is None:
+            self.set("vary", value)
+        elif value.lower() not in current.lower():
+            self.set("vary", f"{current}, {value}")
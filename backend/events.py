@@ -0,0 +1,175 @@
+"""
+Change feed behind GET /events (Server-Sent Events).
+
+Every write to the library publishes one event, numbered with the library version it bumped to:
+
+    id: 42
+    event: change
+    data: {"version": 42, "games": [{"id": "...", "fields": {"played": true}}, {"id": "...", "deleted": true}]}
+
+`fields` holds only what changed (every public field for a new game), so clients patch the games
+they hold instead of reloading their lists. When the changed games are not known (imports, to play
+list rebalances) the event has `"reload": true` instead of `games`.
+
+Events are written to a small capped collection that every worker tails into an in-memory ring
+buffer (tailable cursors need no replica set), so a client gets the writes of every worker.
+A client reconnecting with `Last-Event-ID` is sent the events it missed from that buffer; when they
+are no longer there it gets a `reset` event and reloads.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+logger = logging.getLogger("gameslist.events")
+
+EVENTS_COLLECTION = "events"
+# Events kept for reconnecting clients, in memory and in the capped collection
+EVENT_BUFFER_SIZE = int(os.getenv("GAMES_EVENT_BUFFER_SIZE", "1000"))
+EVENT_LOG_BYTES = int(os.getenv("GAMES_EVENT_LOG_BYTES", str(4 * 1024 * 1024)))
+# Seconds between comment lines on an idle stream, so proxies do not close it
+HEARTBEAT_INTERVAL = float(os.getenv("GAMES_EVENTS_HEARTBEAT", "15"))
+# Reconnection delay suggested to EventSource clients, in milliseconds
+RECONNECT_DELAY_MS = 3000
+# Seconds before tailing the collection again after an error (or while it is empty)
+RETRY_DELAY = 1.0
+
+
+def game_changes(changes, fields):
+    """
+    Feed entries for (before, after) pairs of written games. `after` may be partial: its fields
+    that differ from `before` (all of them when `before` is None) are sent.
+    """
+    games = []
+    for before, after in changes:
+        game = after if after is not None else before
+        if after is None or after.get("deleted"):
+            games.append({"id": str(game["_id"]), "deleted": True})
+            continue
+        games.append({"id": str(game["_id"]), "fields": {
+            field: after[field] for field in fields
+            if field != "_id" and field in after and (before is None or before.get(field) != after[field])
+        }})
+    return games
+
+
+def _message(event_type, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_type}", f"data: {json.dumps(data, separators=(',', ':'))}"]
+    return "\n".join(lines) + "\n\n"
+
+
+class ChangeFeed:
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.events = deque()
+        self._ids = set()
+        # Events appended since startup: positions of subscribers are counted in it
+        self.appended = 0
+        # Set when an event is appended; created on first wait, inside the server's event loop
+        self._appended_signal = None
+
+    async def attach(self, database):
+        """Create the capped collection of `database` when missing."""
+        try:
+            await database.create_collection(
+                EVENTS_COLLECTION, capped=True, size=EVENT_LOG_BYTES, max=self.buffer_size
+            )
+        except CollectionInvalid:
+            pass
+
+    async def publish(self, collection, version, games=None):
+        """Record the event of a write; `games` None when the changed games are not known."""
+        event = {"_id": version, "at": datetime.now(timezone.utc)}
+        if games is None:
+            event["reload"] = True
+        else:
+            event["games"] = games
+        try:
+            await collection.insert_one(event)
+        except PyMongoError as e:
+            # The write itself succeeded; clients only miss this event
+            logger.warning("Could not publish change event %s: %s", version, e)
+
+    async def follow(self, collection):
+        """
+        Background task: tail the capped collection into the buffer. The collection keeps no more
+        events than the buffer, so on every restart of the cursor the events not yet buffered are
+        exactly the new ones.
+        """
+        while True:
+            try:
+                cursor = collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        self._append(event)
+            except PyMongoError as e:
+                logger.warning("Change feed tail failed, retrying: %s", e)
+            # A tailable cursor on an empty capped collection dies at once
+            await asyncio.sleep(RETRY_DELAY)
+
+    def _append(self, event):
+        if event["_id"] in self._ids:
+            return
+        self.events.append(event)
+        self._ids.add(event["_id"])
+        while len(self.events) > self.buffer_size:
+            self._ids.discard(self.events.popleft()["_id"])
+        self.appended += 1
+        # Wake every subscriber; the next wait arms a new signal
+        if self._appended_signal is not None:
+            self._appended_signal.set()
+            self._appended_signal = None
+
+    def _position(self, last_event_id):
+        """Position just after the event a client saw last; None when it is not buffered any more."""
+        if not last_event_id:
+            return self.appended
+        try:
+            version = int(last_event_id)
+        except ValueError:
+            return None
+        for index, event in enumerate(self.events):
+            if event["_id"] == version:
+                return self.appended - len(self.events) + index + 1
+        return None
+
+    def _reset(self):
+        latest = self.events[-1]["_id"] if self.events else None
+        return _message("reset", {"version": latest}, latest)
+
+    async def stream(self, last_event_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """SSE text of the events after `last_event_id` (after now when None), then of new ones as they come."""
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        position = self._position(last_event_id)
+        if position is None:
+            yield self._reset()
+            position = self.appended
+        while True:
+            if position < self.appended - len(self.events):
+                # This client read slower than events came in: the ones it missed are gone
+                yield self._reset()
+                position = self.appended
+            pending = self.appended - position
+            if pending:
+                for event in list(self.events)[len(self.events) - pending:]:
+                    data = {"version": event["_id"]}
+                    if event.get("reload"):
+                        data["reload"] = True
+                    else:
+                        data["games"] = event.get("games", [])
+                    yield _message("change", data, event["_id"])
+                # More may have come in while these were sent
+                position += pending
+                continue
+            if self._appended_signal is None:
+                self._appended_signal = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._appended_signal.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
@@ -0,0 +1,187 @@
+"""
+Facet counts for the filters: how many games match each platform, genre, device and played
+status under the other filters, as GET /games/facets returns them.
+
+They are read from a materialized cube: one document per (platform, genre, device, played,
+is_dlc) combination with the number of live games in it. platforms, genres and device are
+arrays, so every game also counts in the "*" (any) cell of each of them; a facet then sums cells
+that hold "*" in the other array dimensions and no game is counted twice.
+
+Writes turn into `$inc` deltas on the cells (as stats.py does for the stats document);
+`refresh_cube` rebuilds the whole cube with one `$merge` aggregation (under the lease of rebuilds.py).
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+CUBE_COLLECTION = "facet_cube"
+ANY = "*"
+
+# Array field of the games collection behind each array dimension of the cube
+ARRAY_DIMENSIONS = {"platform": "platforms", "genre": "genres", "device": "device"}
+CELL_FIELDS = ("platform", "genre", "device", "played", "is_dlc")
+# Clock difference tolerated between the workers stamping `touched_at` on cells
+CLOCK_MARGIN = timedelta(seconds=5)
+
+
+def _cell_id(*cell):
+    # Same field order as the $group _id of _cell_stages: _id equality depends on it
+    return dict(zip(CELL_FIELDS, cell))
+
+
+def cells(game):
+    """Cells a game counts in: nothing when it is missing or soft-deleted."""
+    if not game or game.get("deleted"):
+        return Counter()
+    values = {
+        dimension: {value for value in game.get(field) or [] if value} | {ANY}
+        for dimension, field in ARRAY_DIMENSIONS.items()
+    }
+    played, is_dlc = bool(game.get("played")), bool(game.get("is_dlc"))
+    return Counter(
+        (platform, genre, device, played, is_dlc)
+        for platform in values["platform"]
+        for genre in values["genre"]
+        for device in values["device"]
+    )
+
+
+def cube_delta(before, after):
+    """Cell count changes turning `before` into `after` (either may be None)."""
+    delta = Counter(cells(after))
+    delta.subtract(cells(before))
+    return {cell: change for cell, change in delta.items() if change}
+
+
+async def apply_cube_delta(cube_collection, delta):
+    if not delta:
+        return
+    await cube_collection.bulk_write(
+        [
+            UpdateOne(
+                {"_id": _cell_id(*cell)},
+                {
+                    "$inc": {"count": change},
+                    "$set": {"touched_at": datetime.now(timezone.utc)},
+                    "$setOnInsert": _cell_id(*cell),
+                },
+                upsert=True,
+            )
+            for cell, change in delta.items()
+        ],
+        ordered=False,
+    )
+
+
+def _cell_stages():
+    """Stages turning game documents into one document per cell they count in."""
+    project = {
+        dimension: {"$setUnion": [{"$ifNull": [f"${field}", []]}, [ANY]]}
+        for dimension, field in ARRAY_DIMENSIONS.items()
+    }
+    project["played"] = {"$eq": ["$played", True]}
+    project["is_dlc"] = {"$eq": ["$is_dlc", True]}
+    stages = [{"$project": project}]
+    stages += [{"$unwind": f"${dimension}"} for dimension in ARRAY_DIMENSIONS]
+    stages.append({"$match": {dimension: {"$nin": ["", None]} for dimension in ARRAY_DIMENSIONS}})
+    stages.append({"$group": {
+        "_id": {field: f"${field}" for field in CELL_FIELDS},
+        "count": {"$sum": 1},
+    }})
+    return stages
+
+
+async def refresh_cube(games_collection, cube_collection):
+    """
+    Rebuild the cube from the games collection; cells that no longer exist are removed, except those
+    a write changed since the rebuild started (the scan may have missed that write).
+    """
+    started = datetime.now(timezone.utc) - CLOCK_MARGIN
+    stamp = ObjectId()
+    pipeline = [
+        {"$match": {"deleted": False}},
+        *_cell_stages(),
+        {"$addFields": {
+            **{field: f"$_id.{field}" for field in CELL_FIELDS},
+            "refreshed": stamp,
+        }},
+        {"$merge": {"into": CUBE_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    await games_collection.aggregate(pipeline).to_list(length=None)
+    await cube_collection.delete_many({
+        "refreshed": {"$ne": stamp},
+        "$or": [{"touched_at": {"$exists": False}}, {"touched_at": {"$lt": started}}],
+    })
+
+
+def _facet_stages(platform, genre, played, include_dlc):
+    platform = platform if platform and platform != "all" else ANY
+    genre = genre if genre and genre != "all" else ANY
+    played_match = {} if played is None else {"played": played}
+
+    def counts(dimension, match):
+        return [
+            {"$match": {**match, dimension: {"$ne": ANY}}},
+            {"$group": {"_id": f"${dimension}", "count": {"$sum": "$count"}}},
+        ]
+
+    match = {"$or": [
+        {"genre": genre, "device": ANY},
+        {"platform": platform, "device": ANY},
+        {"platform": platform, "genre": genre},
+    ]}
+    if not include_dlc:
+        match["is_dlc"] = False
+    return [
+        {"$match": match},
+        # Each facet ignores its own filter, so a dropdown shows what picking another value would give
+        {"$facet": {
+            "platforms": counts("platform", {"genre": genre, "device": ANY, **played_match}),
+            "genres": counts("genre", {"platform": platform, "device": ANY, **played_match}),
+            "devices": counts("device", {"platform": platform, "genre": genre, **played_match}),
+            "played": [
+                {"$match": {"platform": platform, "genre": genre, "device": ANY}},
+                {"$group": {"_id": "$played", "count": {"$sum": "$count"}}},
+            ],
+        }},
+    ]
+
+
+def _format(facets, played):
+    def ranked(items):
+        return dict(sorted(
+            ((item["_id"], item["count"]) for item in items if item["count"] > 0),
+            key=lambda item: -item[1],
+        ))
+
+    by_status = {item["_id"]: item["count"] for item in facets["played"]}
+    return {
+        "total": by_status.get(played, 0) if played is not None else sum(by_status.values()),
+        "played": {"played": by_status.get(True, 0), "not_played": by_status.get(False, 0)},
+        "platforms": ranked(facets["platforms"]),
+        "genres": ranked(facets["genres"]),
+        "devices": ranked(facets["devices"]),
+    }
+
+
+async def facet_counts(cube_collection, platform=None, genre=None, played=None, include_dlc=False):
+    """All facet counts of a filter, from the cube in one aggregation."""
+    result = await cube_collection.aggregate(_facet_stages(platform, genre, played, include_dlc)).to_list(length=1)
+    return _format(result[0], played)
+
+
+async def search_facet_counts(games_collection, search_clause, platform=None, genre=None, played=None, include_dlc=False):
+    """
+    Facet counts of a filter with a search: the cube has no search dimension, so the cells of
+    the matching games are built on the fly (searches match few games).
+    """
+    pipeline = [
+        {"$match": {"deleted": False, **search_clause}},
+        *_cell_stages(),
+        {"$addFields": {field: f"$_id.{field}" for field in CELL_FIELDS}},
+        *_facet_stages(platform, genre, played, include_dlc),
+    ]
+    result = await games_collection.aggregate(pipeline).to_list(length=1)
+    return _format(result[0], played)
@@ -0,0 +1,138 @@
+"""
+Streaming import for POST /games/import.
+
+The request body (NDJSON, or one JSON array) is parsed incrementally as it arrives, so a big
+library never has to be held in memory; the API turns the records into upserts and writes them
+in unordered chunks.
+"""
+import codecs
+import json
+
+MAX_ERRORS_PER_CHUNK = 20
+
+# Characters a JSON number can be made of
+NUMBER_CHARS = frozenset("0123456789+-.eE")
+# Bare words the decoder accepts
+LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+# Longest escape a string can be cut in (a surrogate pair, \ud83d\ude00), in characters
+LONGEST_ESCAPE = 12
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+async def iter_ndjson(stream):
+    """Yield (record number, parsed value or exception) for each non-empty line."""
+    buffer = b""
+    number = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                number += 1
+                yield number, _parse_line(line)
+    if buffer.strip():
+        number += 1
+        yield number, _parse_line(buffer)
+
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+
+async def iter_json_array(stream):
+    """
+    Yield (record number, parsed value) for each element of a top-level JSON array, decoding
+    each element as soon as it is complete. Raises ImportFormatError on malformed input.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    # What comes next: "[", the "first" element or "]", an "element", a "separator" (, or ]), then the "end"
+    expected = "["
+    number = 0
+    stream_done = False
+    stream_iter = stream.__aiter__()
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n":
+            position += 1
+        if position < len(buffer):
+            char = buffer[position]
+            if expected == "[":
+                if char != "[":
+                    raise ImportFormatError("Expected a JSON array")
+                expected = "first"
+                position += 1
+                continue
+            if expected == "end":
+                raise ImportFormatError("Unexpected data after the JSON array")
+            if char == "]" and expected in ("first", "separator"):
+                expected = "end"
+                position += 1
+                continue
+            if expected == "separator":
+                if char != ",":
+                    raise ImportFormatError(f"Expected ',' or ']' after record {number}")
+                expected = "element"
+                position += 1
+                continue
+            if char in ",]":
+                raise ImportFormatError(f"Malformed JSON at record {number + 1}")
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                # An element cut by the chunk boundary: read more. Anything else fails now, not once the
+                # rest of the body has been buffered
+                if stream_done or not _cut_off(buffer, e):
+                    raise ImportFormatError(f"Malformed JSON at record {number + 1}: {e.msg}")
+            else:
+                if _complete(buffer, position, value) or stream_done:
+                    number += 1
+                    position = end
+                    expected = "separator"
+                    yield number, value
+                    continue
+        elif stream_done:
+            if expected != "end":
+                raise ImportFormatError("Unexpected end of JSON array")
+            return
+
+        try:
+            chunk = await stream_iter.__anext__()
+        except StopAsyncIteration:
+            stream_done = True
+            buffer = buffer[position:] + text_decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+
+
+def _complete(buffer, position, value):
+    """
+    Whether an element decoded at `position` cannot go on in the next chunk. Only numbers can: 12 cut
+    after the 1 decodes as 1, and -3.5 cut after the dot as -3. They are complete once something follows.
+    """
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return True
+    end = position
+    while end < len(buffer) and buffer[end] in NUMBER_CHARS:
+        end += 1
+    return end < len(buffer)
+
+
+def _cut_off(buffer, error):
+    """Whether a decoding error may only come from the end of `buffer`, which more data would complete."""
+    if error.pos >= len(buffer) or error.msg.startswith("Unterminated string"):
+        return True
+    if error.msg.startswith("Invalid \\uXXXX escape"):
+        return len(buffer) - error.pos <= LONGEST_ESCAPE
+    # A bare word cut short: 'tr' of true
+    rest = buffer[error.pos:]
+    return any(literal.startswith(rest) for literal in LITERALS)
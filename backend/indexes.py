@@ -0,0 +1,142 @@
+"""
+Declared indexes for the games collection and the startup reconciliation that keeps
+MongoDB in line with them.
+"""
+import logging
+import os
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger("gameslist.indexes")
+
+# Set to "1" to drop indexes that exist in Mongo but are not declared below
+PRUNE_UNDECLARED = os.getenv("GAMES_PRUNE_INDEXES", "0") == "1"
+
+# Error code of dropping an index that does not exist
+INDEX_NOT_FOUND = 27
+
+# Options that change how an index behaves; anything else (v, ns, background...) is ignored when diffing
+COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+# Indexes of the read paths cover only live games: `deleted` is always stored, so every read filters
+# on `deleted: False` by equality and can use them, and soft-deleted games stay out of them.
+LIVE = {"partialFilterExpression": {"deleted": False}}
+
+# One entry per filter shape used by the routes in main.py.
+# platforms and genres are arrays (multikey), so they can never share a compound index.
+# Listings are pages in _id order: equality fields first and _id last, so a page (first or after a
+# cursor) is a walk of `limit` index keys instead of a sort of every match. Counts use the same indexes.
+GAME_INDEXES = [
+    # list_games / get_stats without platform or genre filter
+    IndexModel([("is_dlc", ASCENDING), ("_id", ASCENDING)], name="games_live_keyset", **LIVE),
+    IndexModel([("is_dlc", ASCENDING), ("played", ASCENDING), ("_id", ASCENDING)], name="games_live_played", **LIVE),
+    # list_games / get_random_game filtered by platform
+    IndexModel(
+        [("platforms", ASCENDING), ("is_dlc", ASCENDING), ("_id", ASCENDING)],
+        name="games_platform_keyset", **LIVE,
+    ),
+    IndexModel(
+        [("platforms", ASCENDING), ("played", ASCENDING), ("is_dlc", ASCENDING), ("_id", ASCENDING)],
+        name="games_platform_played", **LIVE,
+    ),
+    # list_games / get_random_game filtered by genre
+    IndexModel(
+        [("genres", ASCENDING), ("is_dlc", ASCENDING), ("_id", ASCENDING)],
+        name="games_genre_keyset", **LIVE,
+    ),
+    IndexModel(
+        [("genres", ASCENDING), ("played", ASCENDING), ("is_dlc", ASCENDING), ("_id", ASCENDING)],
+        name="games_genre_played", **LIVE,
+    ),
+    # search parameter of list_games / get_random_game (see search.py)
+    IndexModel([("search_tokens", ASCENDING), ("is_dlc", ASCENDING)], name="games_search_tokens", **LIVE),
+    # get_random_game: seek on random_key, optionally narrowed by platform or genre (see sampling.py)
+    IndexModel([("random_key", ASCENDING)], name="games_random_key", **LIVE),
+    IndexModel([("platforms", ASCENDING), ("random_key", ASCENDING)], name="games_platform_random", **LIVE),
+    IndexModel([("genres", ASCENDING), ("random_key", ASCENDING)], name="games_genre_random", **LIVE),
+    # GET /games/changes: range scan on the change sequence, soft-deleted games included (see sync.py)
+    IndexModel([("change_seq", ASCENDING)], name="games_change_seq"),
+    # upsert-by-title of POST /games/import
+    IndexModel([("title", ASCENDING)], name="games_title", **LIVE),
+    # get_to_play_list / toggle_to_play: equality on to_play, sorted by to_play_order
+    IndexModel([("to_play", ASCENDING), ("to_play_order", ASCENDING)], name="games_to_play_order", **LIVE),
+    # archiver: soft-deleted games by deletion time (see archiving.py)
+    IndexModel(
+        [("deleted_at", ASCENDING)],
+        name="games_deleted_at", partialFilterExpression={"deleted": True},
+    ),
+]
+
+# facet_cube (see facets.py): one index per branch of the $or in its facet query
+CUBE_INDEXES = [
+    IndexModel([("genre", ASCENDING), ("device", ASCENDING)], name="cube_genre_device"),
+    IndexModel([("platform", ASCENDING), ("device", ASCENDING)], name="cube_platform_device"),
+    IndexModel([("platform", ASCENDING), ("genre", ASCENDING)], name="cube_platform_genre"),
+]
+
+
+def _spec(index):
+    """Normalize an index description (IndexModel document or list_indexes entry) for comparison."""
+    key = [(field, direction) for field, direction in dict(index["key"]).items()]
+    options = {opt: index[opt] for opt in COMPARED_OPTIONS if opt in index}
+    return {"key": key, "options": options}
+
+
+async def index_drift(collection, declared=GAME_INDEXES):
+    """Compare declared indexes with the ones that actually exist on the collection."""
+    actual = {}
+    async for index in collection.list_indexes():
+        actual[index["name"]] = _spec(index)
+
+    missing, mismatched = [], []
+    for model in declared:
+        document = model.document
+        name = document["name"]
+        if name not in actual:
+            missing.append(name)
+        elif actual[name] != _spec(document):
+            mismatched.append(name)
+
+    declared_names = {model.document["name"] for model in declared}
+    undeclared = sorted(name for name in actual if name != "_id_" and name not in declared_names)
+
+    return {
+        "declared": sorted(declared_names),
+        "missing": missing,
+        "mismatched": mismatched,
+        "undeclared": undeclared,
+    }
+
+
+async def _drop_index(collection, name):
+    try:
+        await collection.drop_index(name)
+    except OperationFailure as e:
+        # Another worker reconciling at the same time dropped it first
+        if e.code != INDEX_NOT_FOUND:
+            raise
+
+
+async def ensure_indexes(collection, declared=GAME_INDEXES, prune=PRUNE_UNDECLARED):
+    """Create missing indexes, rebuild mismatched ones and report (or drop) undeclared ones."""
+    drift = await index_drift(collection, declared)
+
+    for name in drift["mismatched"]:
+        logger.warning("Index %s differs from its declaration, rebuilding", name)
+        await _drop_index(collection, name)
+
+    to_create = [m for m in declared if m.document["name"] in drift["missing"] + drift["mismatched"]]
+    if to_create:
+        created = await collection.create_indexes(to_create)
+        logger.info("Created indexes: %s", ", ".join(created))
+
+    if drift["undeclared"]:
+        if prune:
+            for name in drift["undeclared"]:
+                await _drop_index(collection, name)
+            logger.info("Dropped undeclared indexes: %s", ", ".join(drift["undeclared"]))
+        else:
+            logger.warning("Undeclared indexes on collection: %s", ", ".join(drift["undeclared"]))
+
+    return drift
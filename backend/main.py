@@ -1,12 +1,161 @@
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field, BeforeValidator
-from typing import List, Optional, Annotated
+from pydantic import BaseModel, Field, BeforeValidator, ValidationError
+from typing import List, Optional, Annotated, Union, Literal
 import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
 from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
-app = FastAPI()
+from compression import CompressionMiddleware
+from archiving import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_COLLECTION, ARCHIVE_INTERVAL, archive_periodically, archived_through, deletion_fields,
+    normalize_flags, restore_game,
+)
+from caching import (
+    CountCache, bump_version, canonical_filter, document_etag, is_not_modified, make_etag, read_version, validator_headers,
+    watch_version,
+)
+from events import EVENTS_COLLECTION, ChangeFeed, game_changes
+from facets import CUBE_COLLECTION, apply_cube_delta, cube_delta, facet_counts, refresh_cube, search_facet_counts
+from importing import MAX_ERRORS_PER_CHUNK, ImportFormatError, iter_json_array, iter_ndjson
+from indexes import CUBE_INDEXES, GAME_INDEXES, ensure_indexes, index_drift
+from memstore import LibraryReplica
+from metrics import MetricsMiddleware, event_listeners, process_exited as metrics_process_exited, render as render_metrics
+from ordering import (
+    ORDER_GAP, TO_PLAY_QUERY, TO_PLAY_SORT, allocate_order, order_between, rebalance_periodically, reorder,
+    seed_order_counter,
+)
+from profiling import SlowQueryLog, query_report
+from rebuilds import rebuild_exclusively
+from pagination import InvalidCursor, after_id, after_score, decode_cursor, encode_cursor
+from sampling import backfill_random_keys, new_random_key, pick_random, rekey_periodically
+from stats import STATS_DOCUMENT_ID, apply_delta, contribution, format_stats, read_stats, recompute_stats, stats_delta
+from singleflight import SingleFlight
+from serialization import FastJSONResponse, csv_chunk, json_array_chunk, make_projector, ndjson_chunk
+from search import backfill_search_fields, match_clause, query_tokens, score_expression, search_fields
+from sync import backfill_change_seqs, change_seqs, changes_since, seed_change_seq, sync_limit
+from warmup import MIN_POOL_SIZE, prime_pool, touch_indexes
+
+logger = logging.getLogger("gameslist")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the database and bring it in line (migrations, indexes, derived documents), start the
+    background tasks, then warm up before taking traffic: GET /ready answers 503 until then.
+    """
+    app.mongodb_client = AsyncIOMotorClient(
+        MONGO_URL, minPoolSize=MIN_POOL_SIZE, event_listeners=[*event_listeners(), slow_query_log]
+    )
+    app.mongodb = app.mongodb_client[DB_NAME]
+    collection, meta = app.mongodb[COLLECTION_NAME], app.mongodb[META_COLLECTION_NAME]
+
+    async def load_library_version():
+        app.library_version, app.library_updated_at = await read_version(meta)
+
+    async def normalize():
+        if normalized := await normalize_flags(collection):
+            logger.info("Stored deleted/is_dlc flags on %d games", normalized)
+
+    async def backfill_search():
+        if backfilled := await backfill_search_fields(collection):
+            logger.info("Computed search fields for %d games", backfilled)
+
+    async def random_keys():
+        if backfilled := await backfill_random_keys(collection):
+            logger.info("Assigned random keys to %d games", backfilled)
+
+    async def stamp_change_seqs():
+        if backfilled := await backfill_change_seqs(collection, meta):
+            logger.info("Assigned change sequence numbers to %d games", backfilled)
+
+    async def load_replica():
+        if replica is not None:
+            await replica.load(collection)
+
+    # Each step runs even when an earlier one failed: most only make this worker slower without them
+    failed = []
+    for name, step in [
+        ("library version", load_library_version),
+        ("deleted/is_dlc flags", normalize),
+        ("game indexes", lambda: ensure_indexes(collection)),
+        ("search fields", backfill_search),
+        ("random keys", random_keys),
+        ("to play order counter", lambda: seed_order_counter(collection, meta)),
+        ("change_seq counter", lambda: seed_change_seq(collection, meta)),
+        ("change sequence numbers", stamp_change_seqs),
+        ("stats", lambda: rebuild_stats(if_missing=True)),
+        ("facet cube indexes", lambda: ensure_indexes(app.mongodb[CUBE_COLLECTION], CUBE_INDEXES)),
+        ("facet cube", lambda: rebuild_cube(if_missing=True)),
+        ("slow query log", lambda: slow_query_log.attach(app.mongodb)),
+        ("change feed", lambda: change_feed.attach(app.mongodb)),
+        ("replica", load_replica),
+    ]:
+        try:
+            await step()
+        except PyMongoError as e:
+            logger.error("Startup step '%s' failed: %s", name, e)
+            failed.append(name)
+    app.startup_failures = [name for name in failed if name in REQUIRED_STARTUP_STEPS]
+
+    app.background_tasks = [
+        asyncio.create_task(rebalance_periodically(
+            app.mongodb[COLLECTION_NAME], app.mongodb[META_COLLECTION_NAME], REBALANCE_INTERVAL,
+            on_rebalanced=library_changed,
+        )),
+        # Writes handled by other workers (see caching.watch_version)
+        asyncio.create_task(watch_version(
+            app.mongodb[META_COLLECTION_NAME], library_version_changed, on_following=version_following,
+        )),
+        asyncio.create_task(change_feed.follow(app.mongodb[EVENTS_COLLECTION])),
+        asyncio.create_task(archive_periodically(
+            app.mongodb[COLLECTION_NAME], app.mongodb[ARCHIVE_COLLECTION], app.mongodb[META_COLLECTION_NAME],
+            ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL,
+        )),
+        asyncio.create_task(rekey_periodically(app.mongodb[COLLECTION_NAME])),
+    ]
+    if replica is not None:
+        app.background_tasks.append(asyncio.create_task(replica.follow(app.mongodb[COLLECTION_NAME])))
+
+    try:
+        await warm_up()
+    except PyMongoError as e:
+        # Serve anyway, only colder
+        logger.error("Warm-up failed: %s", e)
+    if app.startup_failures:
+        logger.error("Not ready: required startup steps failed: %s", ", ".join(app.startup_failures))
+    else:
+        app.ready = True
+
+    yield
+
+    app.ready = False
+    for task in app.background_tasks:
+        task.cancel()
+    app.mongodb_client.close()
+    metrics_process_exited()
+
+app = FastAPI(lifespan=lifespan)
+# Set once lifespan has warmed this worker up (GET /ready)
+app.ready = False
+# Required startup steps that failed: the worker stays unready (GET /ready)
+app.startup_failures = []
+# Startup steps without which answers would be wrong rather than slow (counts, sync, events)
+REQUIRED_STARTUP_STEPS = ("deleted/is_dlc flags", "change_seq counter", "stats", "facet cube", "change feed")
+# Library version the read caches of this worker are up to date with, and when it was bumped (see check_not_modified)
+app.library_version = 0
+app.library_updated_at = None
+# Whether the version watch follows a change stream, which keeps library_version current
+app.version_followed = False
 
 # CORS
 app.add_middleware(
@@ -17,14 +166,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli negotiated per request; sizes and levels come from the environment (see compression.py)
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so request latencies include compression (see metrics.py)
+app.add_middleware(MetricsMiddleware)
+
 # Database Config
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGO_DB_NAME", "games_library")
 COLLECTION_NAME = "games"
+# Seconds between checks of the to play list gaps (see ordering.py)
+REBALANCE_INTERVAL = float(os.getenv("GAMES_REBALANCE_INTERVAL", "3600"))
+META_COLLECTION_NAME = "meta"  # Library version and other bookkeeping documents
+# Serve the read routes from an in-memory copy of the library (see memstore.py)
+MEMORY_REPLICA = os.getenv("GAMES_MEMORY_REPLICA", "0") == "1"
+
+# Totals of listing filters, dropped whenever a game is created, updated or deleted
+count_cache = CountCache()
+
+# Identical concurrent reads (listing pages, stats, facets) share one Mongo operation (see singleflight.py)
+read_flights = SingleFlight()
+# Requests noticing the same newer library version share one catch-up
+version_flights = SingleFlight()
+
+# Reads on the games collection slower than GAMES_SLOW_QUERY_MS, with their plans (see profiling.py)
+slow_query_log = SlowQueryLog(COLLECTION_NAME)
+
+# Writes of every worker, streamed to clients by GET /events (see events.py)
+change_feed = ChangeFeed()
 
 # Models
 # Helper to handle ObjectId as string
 PyObjectId = Annotated[str, BeforeValidator(str)]
+# Flags queried by equality are always stored as booleans: null means False (see archiving.py)
+StoredBool = Annotated[bool, BeforeValidator(lambda value: False if value is None else value)]
 
 class GameModel(BaseModel):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
@@ -36,12 +212,13 @@ class GameModel(BaseModel):
     notes: Optional[str] = ""
     played: bool = False
     rating: Optional[int] = None
-    is_dlc: bool = False  # Indicates if this is DLC/Expansion content
+    is_dlc: StoredBool = False  # Indicates if this is DLC/Expansion content
     to_play: bool = False  # Indicates if this is in the "to play" list
     to_play_order: Optional[int] = None  # Order in the "to play" list
     description: Optional[str] = None  # Game description
     release_date: Optional[str] = None  # Game release date
-    deleted: Optional[bool] = False
+    deleted: StoredBool = False
+    change_seq: Optional[int] = None  # Set by the server on every write (see sync.py)
 
     class Config:
         populate_by_name = True
@@ -55,6 +232,30 @@ class GameModel(BaseModel):
             }
         }
 
+class GameSummaryModel(BaseModel):
+    """What a card of the grid shows: GET /games?fields=summary. Details come from GET /games/{id}."""
+    id: Optional[PyObjectId] = Field(alias="_id", default=None)
+    title: str
+    custom_title: Optional[str] = None
+    platforms: List[str] = []
+    device: List[str] = ["PC"]
+    genres: List[str] = []
+    played: bool = False
+    rating: Optional[int] = None
+    is_dlc: StoredBool = False
+    to_play: bool = False
+
+    class Config:
+        populate_by_name = True
+
+# Public document fields, as stored in Mongo
+GAME_FIELDS = [field.alias or name for name, field in GameModel.model_fields.items()]
+GAME_DEFAULTS = {field.alias or name: field.get_default(call_default_factory=True) for name, field in GameModel.model_fields.items()}
+SUMMARY_FIELDS = [field.alias or name for name, field in GameSummaryModel.model_fields.items()]
+
+# In-memory copy of the live games answering the read routes when GAMES_MEMORY_REPLICA=1
+replica = LibraryReplica(GAME_FIELDS) if MEMORY_REPLICA else None
+
 class UpdateGameModel(BaseModel):
     title: Optional[str] = None
     custom_title: Optional[str] = None
@@ -67,92 +268,392 @@ class UpdateGameModel(BaseModel):
     to_play_order: Optional[int] = None
     description: Optional[str] = None
     release_date: Optional[str] = None
-    deleted: Optional[bool] = None
+    deleted: StoredBool = None  # Unset: unchanged; null: stored as False
+
+class MoveToPlayModel(BaseModel):
+    after_id: Optional[str] = None  # Game that will precede the moved one; None to move it to the top
+    before_id: Optional[str] = None  # Game that will follow the moved one; None to move it to the bottom
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[str] = None  # update and delete
+    game: Optional[GameModel] = None  # create
+    changes: Optional[UpdateGameModel] = None  # update
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(max_length=1000)
+
+class LookupRequest(BaseModel):
+    ids: List[str] = Field(max_length=1000)
+
+class PaginatedGameSummaryResponse(BaseModel):
+    items: List[GameSummaryModel]
+    total: Optional[int] = None
+    skip: int
+    limit: int
+    next_cursor: Optional[str] = None
 
 class PaginatedGameResponse(BaseModel):
     items: List[GameModel]
-    total: int
+    total: Optional[int] = None  # None when the request passed include_total=false
     skip: int
     limit: int
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to fetch the next page; None on the last page
 
-@app.on_event("startup")
-async def startup_db_client():
-    app.mongodb_client = AsyncIOMotorClient(MONGO_URL)
-    app.mongodb = app.mongodb_client[DB_NAME]
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    app.mongodb_client.close()
-
-# Routes
+async def warm_up():
+    """
+    Connections, hot indexes and the first reads of the UI (stats, facets and the first page of the
+    default listing, whose total lands in the count cache), so that the first requests are not cold.
+    """
+    started = time.monotonic()
+    await prime_pool(app.mongodb)
+    await touch_indexes(app.mongodb[COLLECTION_NAME], GAME_INDEXES)
+    await touch_indexes(app.mongodb[CUBE_COLLECTION], CUBE_INDEXES)
+    query = build_games_query(include_dlc=False)
+    await read_games_page(query, {}, None, [], dict.fromkeys(SUMMARY_FIELDS, 1), 0, 100, True)
+    await read_stats(app.mongodb[META_COLLECTION_NAME])
+    await facet_counts(app.mongodb[CUBE_COLLECTION])
+    logger.info("Warmed up in %.0f ms", (time.monotonic() - started) * 1000)
 
-@app.get("/", tags=["Root"])
-async def read_root():
-    return {"message": "GamesList API is running"}
+# Query helpers
 
-@app.get("/games", response_model=PaginatedGameResponse, tags=["Games"])
-async def list_games(
+def build_games_query(
     search: Optional[str] = None,
     platform: Optional[str] = None,
     genre: Optional[str] = None,
     played: Optional[bool] = None,
-    include_dlc: bool = False,
-    skip: int = 0,
-    limit: int = 100
-):
-    query = {"deleted": {"$ne": True}}
+    include_dlc: bool = True,
+) -> dict:
+    """Mongo filter shared by the listing endpoints."""
+    query = {"deleted": False}
 
     if search:
-        # Case insensitive search on title or custom_title
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"custom_title": {"$regex": search, "$options": "i"}}
-        ]
-    
+        # Token lookup on the indexed search_tokens field; user input is never used as a regex.
+        # A search with nothing searchable in it (only punctuation) matches nothing.
+        query.update(match_clause(query_tokens(search) or [""]))
+
     if platform and platform != "all":
         query["platforms"] = platform
-    
+
     if genre and genre != "all":
         query["genres"] = genre
-        
+
     if played is not None:
         query["played"] = played
-    
+
     # By default, exclude DLC unless explicitly requested
     if not include_dlc:
-        query["is_dlc"] = {"$ne": True}
+        query["is_dlc"] = False
 
-    total = await app.mongodb[COLLECTION_NAME].count_documents(query)
-    games_cursor = app.mongodb[COLLECTION_NAME].find(query).skip(skip).limit(limit)
-    games = await games_cursor.to_list(length=limit)
-    
-    return {
-        "items": games,
+    return query
+
+def new_game_document(game: GameModel) -> dict:
+    """Document to insert for a new game, with its derived fields."""
+    new_game = game.model_dump(by_alias=True, exclude=["id"])
+    new_game.update(search_fields(new_game["title"], new_game.get("custom_title")))
+    new_game["random_key"] = new_random_key()
+    return new_game
+
+def with_search_fields(update_data: dict, current: dict) -> dict:
+    """Add the recomputed search fields to a $set when it changes a title of `current`."""
+    if "title" in update_data or "custom_title" in update_data:
+        merged = {**current, **update_data}
+        update_data = {**update_data, **search_fields(merged.get("title"), merged.get("custom_title"))}
+    return update_data
+
+def with_deletion_time(update_data: dict) -> dict:
+    """Add deleted_at to a $set that changes `deleted` (see archiving.py)."""
+    if "deleted" in update_data:
+        update_data = {**update_data, **deletion_fields(update_data["deleted"])}
+    return update_data
+
+def requested_fields(fields: Optional[str]) -> tuple:
+    """Parse the `fields` parameter: 'summary', or a comma separated list of game fields. _id is always included."""
+    if not fields:
+        return tuple(GAME_FIELDS)
+    if fields == "summary":
+        return tuple(SUMMARY_FIELDS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if unknown := [name for name in names if name not in GAME_FIELDS]:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ("_id",) + tuple(dict.fromkeys(name for name in names if name != "_id"))
+
+@lru_cache(maxsize=64)
+def projector(fields: tuple):
+    """Maps a stored game to the given public fields, with model defaults for the missing ones (see serialization.py)."""
+    return make_projector(fields, GAME_DEFAULTS)
+
+def trusted_response(content, response: Response) -> FastJSONResponse:
+    """
+    Send documents read from the games collection without response_model validation, keeping the
+    headers (ETag...) already set on `response`. Items must have gone through `projector`.
+    """
+    return FastJSONResponse(content, headers={k: v for k, v in response.headers.items() if k != "content-length"})
+
+async def rebuild_stats(if_missing=False):
+    """recompute_stats, one worker at a time (see rebuilds.py); with if_missing, only when there is no stats document."""
+    async def missing():
+        return not await read_stats(app.mongodb[META_COLLECTION_NAME])
+
+    await rebuild_exclusively(
+        app.mongodb[META_COLLECTION_NAME], STATS_DOCUMENT_ID,
+        lambda: recompute_stats(app.mongodb[COLLECTION_NAME], app.mongodb[META_COLLECTION_NAME]),
+        missing if if_missing else None,
+    )
+    return await read_stats(app.mongodb[META_COLLECTION_NAME])
+
+async def rebuild_cube(if_missing=False):
+    """refresh_cube, one worker at a time (see rebuilds.py); with if_missing, only when the cube is empty."""
+    async def empty():
+        return not await app.mongodb[CUBE_COLLECTION].find_one({}, {"_id": 1})
+
+    await rebuild_exclusively(
+        app.mongodb[META_COLLECTION_NAME], CUBE_COLLECTION,
+        lambda: refresh_cube(app.mongodb[COLLECTION_NAME], app.mongodb[CUBE_COLLECTION]),
+        empty if if_missing else None,
+    )
+
+async def library_changed(
+    stats_change: Optional[dict] = None, changed_ids: Optional[list] = None, cube_change: Optional[dict] = None,
+    changes: Optional[list] = None,
+):
+    """
+    Call after every write to the games collection: applies the stats and facet cube deltas of the write
+    (see stats.py and facets.py), drops read caches and bumps the library version. `changed_ids` are the
+    games written, re-read into the in-memory replica when there is one; None when they are not known
+    (the replica is reloaded). `changes` are their (before, after) pairs, published on the change feed
+    (see events.py).
+    """
+    await apply_delta(app.mongodb[META_COLLECTION_NAME], stats_change)
+    await apply_cube_delta(app.mongodb[CUBE_COLLECTION], cube_change)
+    count_cache.invalidate()
+    read_flights.forget()
+    if replica is not None:
+        if changed_ids is None:
+            await replica.load(app.mongodb[COLLECTION_NAME])
+        else:
+            await replica.refresh(app.mongodb[COLLECTION_NAME], changed_ids)
+    version, updated_at = await bump_version(app.mongodb[META_COLLECTION_NAME])
+    if version == app.library_version + 1:
+        # Otherwise another worker bumped it in between: this one catches up on its next read
+        app.library_version, app.library_updated_at = version, updated_at
+    await change_feed.publish(
+        app.mongodb[EVENTS_COLLECTION], version,
+        None if changed_ids is None else game_changes(changes or [], GAME_FIELDS),
+    )
+
+async def library_version_changed(version: int, updated_at: Optional[datetime] = None):
+    """
+    Called in every worker when the library version moves: drops this process's read caches, unless
+    they already reflect `version` (the write was handled here, or a read caught up first).
+    """
+    if version <= app.library_version:
+        return
+    count_cache.invalidate()
+    read_flights.forget()
+    if replica is not None and not replica.following:
+        # No change stream to say which games changed
+        await replica.load(app.mongodb[COLLECTION_NAME])
+    if version > app.library_version:
+        app.library_version, app.library_updated_at = version, updated_at
+
+def version_following(following: bool):
+    """Told by watch_version whether its change stream is open (see check_not_modified)."""
+    app.version_followed = following
+
+async def check_not_modified(request: Request, response: Response, resource: str) -> Optional[Response]:
+    """
+    Attach ETag/Last-Modified derived from the library version to a read route.
+    Returns a 304 response to send instead when the client copy is still current.
+    """
+    if app.version_followed:
+        # The version watch reports every bump as it happens: no round trip to the database
+        version, updated_at = app.library_version, app.library_updated_at
+    else:
+        version, updated_at = await read_version(app.mongodb[META_COLLECTION_NAME])
+        if version > app.library_version:
+            # Another worker wrote and watch_version has not told this one yet: serving its caches under
+            # the new ETag would pin their stale content in clients and the compressed body cache
+            await version_flights.do(
+                "library_version", version, lambda: library_version_changed(version, updated_at)
+            )
+    etag = make_etag(resource, version, request.url.query)
+    headers = validator_headers(etag, updated_at)
+    if is_not_modified(request.headers, etag, updated_at):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Routes
+
+@app.get("/", tags=["Root"])
+async def read_root():
+    return {"message": "GamesList API is running"}
+
+@app.get("/ready", include_in_schema=False)
+async def readiness():
+    """Readiness probe: 200 once this worker has warmed up and while MongoDB answers, 503 otherwise."""
+    if app.startup_failures:
+        return JSONResponse({"status": "startup failed", "failed": app.startup_failures}, status_code=503)
+    if not app.ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        await app.mongodb.command("ping")
+    except PyMongoError as e:
+        return JSONResponse({"status": "database unavailable", "detail": str(e)}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/admin/queries", tags=["Admin"])
+async def get_query_report(limit: int = Query(20, ge=1, le=200)):
+    """Index usage from $indexStats (unused indexes first) and the slowest logged query shapes with their plans."""
+    try:
+        return await query_report(app.mongodb[COLLECTION_NAME], app.mongodb, limit)
+    except PyMongoError as e:
+        raise HTTPException(status_code=503, detail=f"Could not build the query report: {e}")
+
+@app.get("/admin/indexes", tags=["Admin"])
+async def get_index_drift():
+    """Report differences between the declared indexes and the ones present in Mongo."""
+    return await index_drift(app.mongodb[COLLECTION_NAME])
+
+async def read_games_page(query, keyset, search, tokens, projection, skip, limit, include_total):
+    """(total, games) of a list_games page read from Mongo, one game more than `limit` when there is a next page."""
+    collection = app.mongodb[COLLECTION_NAME]
+    total = await count_cache.count(collection, query) if include_total else None
+    if tokens:
+        # Rank matches by relevance; _id keeps the order stable between pages
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"_score": score_expression(search, tokens)}},
+        ]
+        if keyset:
+            pipeline.append({"$match": keyset})
+        pipeline += [
+            {"$sort": {"_score": -1, "_id": 1}},
+            {"$skip": skip},
+            {"$limit": limit + 1},
+            {"$project": {**projection, "_score": 1}},
+        ]
+        return total, await collection.aggregate(pipeline).to_list(length=limit + 1)
+    page_query = {"$and": [query, keyset]} if keyset else query
+    games_cursor = collection.find(page_query, projection).sort("_id", 1).skip(skip).limit(limit + 1)
+    return total, await games_cursor.to_list(length=limit + 1)
+
+@app.get("/games", response_model=Union[PaginatedGameResponse, PaginatedGameSummaryResponse], tags=["Games"])
+async def list_games(
+    request: Request,
+    response: Response,
+    search: Optional[str] = None,
+    platform: Optional[str] = None,
+    genre: Optional[str] = None,
+    played: Optional[bool] = None,
+    include_dlc: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[str] = None,
+):
+    """
+    List games. Pages are either addressed with skip/limit (legacy) or with the opaque
+    `cursor` returned as `next_cursor` by the previous page, in which case skip is ignored.
+    Clients that already know the total (e.g. when loading more) can skip it with include_total=false.
+    `fields=summary` returns GameSummaryModel items (PaginatedGameSummaryResponse), and a comma
+    separated list of field names returns GameModel items with only those; in both cases only they are
+    read from Mongo. Items are stored documents sent through the fast serialization path.
+    """
+    if not_modified := await check_not_modified(request, response, "games"):
+        return not_modified
+
+    query = build_games_query(search, platform, genre, played, include_dlc)
+    tokens = query_tokens(search) if search else []
+    selected = requested_fields(fields)
+    projection = {field: 1 for field in selected}
+
+    try:
+        position = decode_cursor(cursor, query) if cursor else None
+        if tokens:
+            keyset = after_score(position, "_score") if position else {}
+        else:
+            keyset = after_id(position) if position else {}
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if position:
+        skip = 0
+
+    # One extra document tells whether there is a next page
+    if replica is not None and replica.ready:
+        total, games = replica.page(search, platform, genre, played, include_dlc, position, skip, limit)
+        if not include_total:
+            total = None
+    else:
+        total, games = await read_flights.do(
+            "games",
+            canonical_filter([query, keyset, skip, limit, selected, include_total, search if tokens else None]),
+            lambda: read_games_page(query, keyset, search, tokens, projection, skip, limit, include_total),
+        )
+
+    next_cursor = None
+    if len(games) > limit:
+        games = games[:limit]
+        next_cursor = encode_cursor(games[-1], query, "_score" if tokens else None)
+
+    project = projector(selected)
+    return trusted_response({
+        "items": [project(game) for game in games],
         "total": total,
         "skip": skip,
-        "limit": limit
-    }
+        "limit": limit,
+        "next_cursor": next_cursor
+    }, response)
 
 @app.post("/games", response_model=GameModel, tags=["Games"])
 async def create_game(game: GameModel):
-    new_game = game.model_dump(by_alias=True, exclude=["id"])
-    result = await app.mongodb[COLLECTION_NAME].insert_one(new_game)
-    created_game = await app.mongodb[COLLECTION_NAME].find_one({"_id": result.inserted_id})
-    return created_game
+    new_game = new_game_document(game)
+    async with change_seqs(app.mongodb[META_COLLECTION_NAME]) as change_seq:
+        new_game["change_seq"] = change_seq
+        # insert_one sets new_game["_id"]: the inserted document is the response, no read back needed
+        await app.mongodb[COLLECTION_NAME].insert_one(new_game)
+    await library_changed(
+        dict(contribution(new_game)), [new_game["_id"]], cube_delta(None, new_game), [(None, new_game)]
+    )
+    return new_game
 
 @app.put("/games/{id}", response_model=GameModel, tags=["Games"])
 async def update_game(id: str, game_update: UpdateGameModel):
     # Use exclude_unset to distinguish between "missing" (do not update) and "null" (update to None)
     update_data = game_update.model_dump(exclude_unset=True)
+
+    if "title" in update_data or "custom_title" in update_data:
+        # Search fields depend on both titles, so fetch the one that is not being changed
+        current = await app.mongodb[COLLECTION_NAME].find_one(
+            {"_id": ObjectId(id)}, {"title": 1, "custom_title": 1}
+        )
+        if not current:
+            raise HTTPException(status_code=404, detail=f"Game {id} not found")
+        update_data = with_search_fields(update_data, current)
     
     if len(update_data) >= 1:
-        update_result = await app.mongodb[COLLECTION_NAME].update_one(
-            {"_id": ObjectId(id)}, {"$set": update_data}
+        update_data = with_deletion_time(update_data)
+        async with change_seqs(app.mongodb[META_COLLECTION_NAME]) as change_seq:
+            update_data["change_seq"] = change_seq
+            # The previous version is needed to update the stats; the new one is the same plus $set
+            previous = await app.mongodb[COLLECTION_NAME].find_one_and_update(
+                {"_id": ObjectId(id)}, {"$set": update_data}, return_document=ReturnDocument.BEFORE
+            )
+        if not previous:
+            raise HTTPException(status_code=404, detail=f"Game {id} not found")
+        updated = {**previous, **update_data}
+        await library_changed(
+            stats_delta(previous, updated), [previous["_id"]], cube_delta(previous, updated), [(previous, updated)]
         )
-        if update_result.modified_count == 0:
-            existing = await app.mongodb[COLLECTION_NAME].find_one({"_id": ObjectId(id)})
-            if not existing:
-                raise HTTPException(status_code=404, detail=f"Game {id} not found")
+        return updated
     
     if existing := await app.mongodb[COLLECTION_NAME].find_one({"_id": ObjectId(id)}):
         return existing
@@ -162,94 +663,106 @@ async def update_game(id: str, game_update: UpdateGameModel):
 @app.delete("/games/{id}", tags=["Games"])
 async def delete_game(id: str):
     # Soft delete
-    update_result = await app.mongodb[COLLECTION_NAME].update_one(
-        {"_id": ObjectId(id)}, {"$set": {"deleted": True}}
-    )
-    if update_result.modified_count == 1:
+    async with change_seqs(app.mongodb[META_COLLECTION_NAME]) as change_seq:
+        previous = await app.mongodb[COLLECTION_NAME].find_one_and_update(
+            {"_id": ObjectId(id), "deleted": False}, {"$set": {**deletion_fields(True), "change_seq": change_seq}}
+        )
+    if previous:
+        await library_changed(
+            stats_delta(previous, None), [previous["_id"]], cube_delta(previous, None), [(previous, None)]
+        )
         return {"message": "Game deleted"}
         
     raise HTTPException(status_code=404, detail=f"Game {id} not found")
 
-@app.get("/games/random", response_model=GameModel, tags=["Games"])
+@app.post("/games/{id}/restore", response_model=GameModel, tags=["Games"])
+async def restore_deleted_game(id: str):
+    """Undelete a game, whether it is still soft-deleted or already archived."""
+    try:
+        object_id = ObjectId(id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid game ID")
+
+    async with change_seqs(app.mongodb[META_COLLECTION_NAME]) as change_seq:
+        restored = await restore_game(
+            app.mongodb[COLLECTION_NAME], app.mongodb[ARCHIVE_COLLECTION], object_id, change_seq
+        )
+    if restored:
+        await library_changed(
+            dict(contribution(restored)), [object_id], cube_delta(None, restored), [(None, restored)]
+        )
+        return restored
+    raise HTTPException(status_code=404, detail=f"No deleted game {id}")
+
+@app.get("/games/random", response_model=Union[GameModel, List[GameModel]], tags=["Games"])
 async def get_random_game(
     search: Optional[str] = None,
     platform: Optional[str] = None,
     genre: Optional[str] = None,
     played: Optional[bool] = None,
+    count: Optional[int] = Query(None, ge=1, le=50),
+    exclude: List[str] = Query([]),
 ):
-    query = {"deleted": {"$ne": True}}
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"custom_title": {"$regex": search, "$options": "i"}}
-        ]
-    if platform and platform != "all":
-        query["platforms"] = platform
-    if genre and genre != "all":
-        query["genres"] = genre
-    if played is not None:
-        query["played"] = played
+    """
+    Pick a random game matching the filters. With `count`, return a shuffled batch of up to that many
+    distinct games instead, skipping the IDs in `exclude` (repeated or comma separated).
+    """
+    # DLC is not filtered out here, the random picker draws from the whole library
+    query = build_games_query(search, platform, genre, played)
 
-    # Use aggregation to sample 1 random document matches the query
-    pipeline = [
-        {"$match": query},
-        {"$sample": {"size": 1}}
-    ]
-    
-    cursor = app.mongodb[COLLECTION_NAME].aggregate(pipeline)
-    result = await cursor.to_list(length=1)
-    
-    if result:
-        return result[0]
+    try:
+        excluded = [ObjectId(game_id) for value in exclude for game_id in value.split(",") if game_id]
+    except:
+        raise HTTPException(status_code=400, detail="Invalid game ID in exclude")
+
+    if replica is not None and replica.ready:
+        games = replica.pick_random(search, platform, genre, played, count or 1, excluded)
+    else:
+        games = await pick_random(app.mongodb[COLLECTION_NAME], query, count or 1, excluded)
+    if count is not None:
+        return games
+    if games:
+        return games[0]
     
     raise HTTPException(status_code=404, detail="No games found matching criteria")
 
 @app.get("/stats", tags=["Games"])
-async def get_stats():
-    # Pipeline to count total, played, platforms, genres
-    pipeline = [
-        {"$match": {"deleted": {"$ne": True}}},
-        {"$facet": {
-            "total": [{"$count": "count"}],
-            "played": [{"$match": {"played": True}}, {"$count": "count"}],
-            "platforms": [
-                {"$unwind": "$platforms"},
-                {"$group": {"_id": "$platforms", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ],
-            "genres": [
-                {"$unwind": "$genres"},
-                {"$group": {"_id": "$genres", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 15} # Top 15 genres
-            ]
-        }}
-    ]
-    
-    cursor = app.mongodb[COLLECTION_NAME].aggregate(pipeline)
-    result = await cursor.to_list(length=1)
-    
-    # Process result safely
-    stats = result[0]
-    
-    return {
-        "total": stats["total"][0]["count"] if stats["total"] else 0,
-        "played_count": stats["played"][0]["count"] if stats["played"] else 0,
-        "platforms": {item["_id"]: item["count"] for item in stats["platforms"]},
-        "genres": {item["_id"]: item["count"] for item in stats["genres"]}
-    }
+async def get_stats(request: Request, response: Response):
+    if not_modified := await check_not_modified(request, response, "stats"):
+        return not_modified
+
+    if replica is not None and replica.ready:
+        return format_stats(replica.stats())
+
+    async def read():
+        stats = await read_stats(app.mongodb[META_COLLECTION_NAME])
+        if not stats:
+            # Removed by a script (e.g. migrate_to_mongo.py): rebuild it once
+            stats = await rebuild_stats(if_missing=True)
+        return format_stats(stats)
+
+    return await read_flights.do("stats", "", read)
+
+@app.post("/admin/stats/recompute", tags=["Admin"])
+async def recompute_library_stats():
+    """Rebuild the stats document from the games collection, repairing any drift."""
+    stats = await rebuild_stats()
+    await library_changed(changed_ids=[])
+    return format_stats(stats)
 
 @app.get("/games/to-play", response_model=List[GameModel], tags=["Games"])
-async def get_to_play_list():
+async def get_to_play_list(request: Request, response: Response):
     """Get all games marked as 'to play', ordered by to_play_order."""
-    query = {
-        "deleted": {"$ne": True},
-        "to_play": True
-    }
-    
-    cursor = app.mongodb[COLLECTION_NAME].find(query).sort("to_play_order", 1)
-    games = await cursor.to_list(length=1000)
-    return games
+    if not_modified := await check_not_modified(request, response, "to-play"):
+        return not_modified
+
+    fields = tuple(GAME_FIELDS)
+    project = projector(fields)
+    if replica is not None and replica.ready:
+        return trusted_response([project(game) for game in replica.to_play()], response)
+
+    cursor = app.mongodb[COLLECTION_NAME].find(TO_PLAY_QUERY, dict.fromkeys(fields, 1)).sort(TO_PLAY_SORT)
+    return trusted_response([project(game) async for game in cursor], response)
 
 @app.put("/games/{game_id}/to-play", response_model=GameModel, tags=["Games"])
 async def toggle_to_play(game_id: str, to_play: bool = Body(...)):
@@ -263,38 +776,516 @@ async def toggle_to_play(game_id: str, to_play: bool = Body(...)):
     
     # If adding to to_play list, set order to end
     if to_play:
-        # Find the highest to_play_order
-        highest = await app.mongodb[COLLECTION_NAME].find_one(
-            {"to_play": True, "deleted": {"$ne": True}},
-            sort=[("to_play_order", -1)]
-        )
-        new_order = (highest.get("to_play_order", 0) + 1) if highest else 1
-        update_data["to_play_order"] = new_order
+        # Atomic $inc on the order counter: concurrent toggles always get distinct orders
+        update_data["to_play_order"] = await allocate_order(app.mongodb[META_COLLECTION_NAME])
     else:
         # If removing from to_play list, clear the order
         update_data["to_play_order"] = None
     
-    result = await app.mongodb[COLLECTION_NAME].find_one_and_update(
-        {"_id": object_id},
-        {"$set": update_data},
-        return_document=True
-    )
+    async with change_seqs(app.mongodb[META_COLLECTION_NAME]) as change_seq:
+        update_data["change_seq"] = change_seq
+        previous = await app.mongodb[COLLECTION_NAME].find_one_and_update(
+            {"_id": object_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE
+        )
     
-    if result:
+    if previous:
+        result = {**previous, **update_data}
+        # Only to_play and to_play_order go on the change feed
+        await library_changed(changed_ids=[object_id], changes=[(previous, result)])
         return result
     raise HTTPException(status_code=404, detail="Game not found")
 
+@app.put("/games/{game_id}/to-play/move", response_model=GameModel, tags=["Games"])
+async def move_to_play(game_id: str, move: MoveToPlayModel):
+    """Move one game of the 'to play' list between two others. Only the moved game is rewritten."""
+    try:
+        object_id = ObjectId(game_id)
+        after_id = ObjectId(move.after_id) if move.after_id else None
+        before_id = ObjectId(move.before_id) if move.before_id else None
+    except:
+        raise HTTPException(status_code=400, detail="Invalid game ID")
+
+    collection = app.mongodb[COLLECTION_NAME]
+    try:
+        new_order, rebalanced = await order_between(collection, app.mongodb[META_COLLECTION_NAME], after_id, before_id)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    async with change_seqs(app.mongodb[META_COLLECTION_NAME]) as change_seq:
+        result = await collection.find_one_and_update(
+            {**TO_PLAY_QUERY, "_id": object_id},
+            {"$set": {"to_play_order": new_order, "change_seq": change_seq}},
+            return_document=ReturnDocument.AFTER
+        )
+    if result:
+        if rebalanced:
+            # order_between renumbered the whole list: send the orders of all of it
+            cursor = collection.find(TO_PLAY_QUERY, {"to_play_order": 1})
+            orders = [game async for game in cursor]
+            await library_changed(changed_ids=[game["_id"] for game in orders], changes=[(None, game) for game in orders])
+        else:
+            moved = {"_id": object_id, "to_play_order": new_order, "change_seq": change_seq}
+            await library_changed(changed_ids=[object_id], changes=[(None, moved)])
+        return result
+    raise HTTPException(status_code=404, detail="Game not in the to play list")
+
 @app.put("/games/to-play/reorder", tags=["Games"])
 async def reorder_to_play_list(game_ids: List[str] = Body(...)):
     """Reorder the 'to play' list. Accepts an array of game IDs in the desired order."""
-    for index, game_id in enumerate(game_ids, start=1):
-        try:
-            object_id = ObjectId(game_id)
-            await app.mongodb[COLLECTION_NAME].update_one(
-                {"_id": object_id},
-                {"$set": {"to_play_order": index}}
-            )
-        except:
-            continue  # Skip invalid IDs
+    try:
+        object_ids = [ObjectId(game_id) for game_id in game_ids]
+    except:
+        raise HTTPException(status_code=400, detail="Invalid game ID")
+
+    # One bulk_write for the whole list
+    await reorder(app.mongodb[COLLECTION_NAME], app.mongodb[META_COLLECTION_NAME], object_ids)
     
+    await library_changed(changed_ids=object_ids, changes=[
+        (None, {"_id": object_id, "to_play_order": position * ORDER_GAP})
+        for position, object_id in enumerate(object_ids, start=1)
+    ])
     return {"message": "To play list reordered successfully"}
+
+@app.get("/events", tags=["Games"])
+async def stream_events(last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of library changes: one `change` event per write, with the fields of
+    the games it changed, numbered with the library version. Reconnecting EventSource clients send
+    `Last-Event-ID` and get the events they missed, or a `reset` event when those are gone.
+    """
+    return StreamingResponse(
+        change_feed.stream(last_event_id),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx must pass events on as they are sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv", "json": "application/json"}
+
+@app.get("/games/export", tags=["Games"])
+async def export_games(
+    format: Literal["ndjson", "csv", "json"] = "ndjson",
+    search: Optional[str] = None,
+    platform: Optional[str] = None,
+    genre: Optional[str] = None,
+    played: Optional[bool] = None,
+    include_dlc: bool = False,
+    batch_size: int = Query(500, ge=1, le=10000),
+):
+    """
+    Stream the games matching the list_games filters as NDJSON, CSV or a JSON array.
+    Documents are read from a server-side cursor `batch_size` at a time and written out batch by
+    batch, so memory use does not depend on the size of the library.
+    """
+    query = build_games_query(search, platform, genre, played, include_dlc)
+    fields = tuple(GAME_FIELDS)
+    project = projector(fields)
+    cursor = (
+        app.mongodb[COLLECTION_NAME]
+        .find(query, dict.fromkeys(fields, 1))
+        .sort("_id", 1)
+        .batch_size(batch_size)
+    )
+
+    async def batches():
+        batch = []
+        async for game in cursor:
+            batch.append(project(game))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def body():
+        first = True
+        if format == "json":
+            yield b"["
+        elif format == "csv":
+            yield csv_chunk([], fields, header=True)
+        async for batch in batches():
+            if format == "ndjson":
+                yield ndjson_chunk(batch)
+            elif format == "csv":
+                yield csv_chunk(batch, fields)
+            else:
+                yield json_array_chunk(batch, first)
+            first = False
+        if format == "json":
+            yield b"]"
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="games.{format}"'},
+    )
+
+@app.get("/games/changes", tags=["Games"])
+async def get_changes(
+    request: Request,
+    response: Response,
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    fields: Optional[str] = None,
+):
+    """
+    Games created, modified or soft-deleted after the change sequence number `since`, oldest change
+    first. Pass `next_since` back as `since` until `has_more` is false; since=0 returns the whole
+    library, soft-deleted games included. `fields` works as in GET /games (deleted and change_seq
+    are always sent).
+    """
+    if since and since < await archived_through(app.mongodb[META_COLLECTION_NAME]):
+        # Deletions after `since` may have been archived since: they would not be sent
+        raise HTTPException(status_code=410, detail="Changes since then were archived: sync again from since=0")
+    if not_modified := await check_not_modified(request, response, "changes"):
+        return not_modified
+
+    fields = requested_fields(fields)
+    fields += tuple(field for field in ("deleted", "change_seq") if field not in fields)
+    project = projector(fields)
+    # Numbers past the limit may belong to writes still in flight: they are sent on a later call
+    until = await sync_limit(app.mongodb[META_COLLECTION_NAME])
+    games = await changes_since(app.mongodb[COLLECTION_NAME], since, until, dict.fromkeys(fields, 1), limit)
+    has_more = len(games) > limit
+    games = games[:limit]
+    return trusted_response({
+        "items": [project(game) for game in games],
+        "next_since": games[-1]["change_seq"] if has_more else max(since, until),
+        "has_more": has_more,
+    }, response)
+
+@app.get("/games/facets", tags=["Games"])
+async def get_facets(
+    request: Request,
+    response: Response,
+    search: Optional[str] = None,
+    platform: Optional[str] = None,
+    genre: Optional[str] = None,
+    played: Optional[bool] = None,
+    include_dlc: bool = False,
+):
+    """
+    How many games match each platform, genre, device and played status under the list_games filters.
+    Each facet ignores its own filter. Answered from the facet cube in one query (see facets.py).
+    """
+    if not_modified := await check_not_modified(request, response, "facets"):
+        return not_modified
+
+    async def read():
+        if search:
+            search_clause = match_clause(query_tokens(search) or [""])
+            return await search_facet_counts(
+                app.mongodb[COLLECTION_NAME], search_clause, platform, genre, played, include_dlc
+            )
+        return await facet_counts(app.mongodb[CUBE_COLLECTION], platform, genre, played, include_dlc)
+
+    return await read_flights.do("facets", canonical_filter([search, platform, genre, played, include_dlc]), read)
+
+@app.post("/admin/facets/refresh", tags=["Admin"])
+async def refresh_facets():
+    """Rebuild the facet cube from the games collection, repairing any drift."""
+    await rebuild_cube()
+    await library_changed(changed_ids=[])
+    return {"message": "Facet cube rebuilt"}
+
+def import_request(record: dict, key: str):
+    """
+    (filter, update) of the upsert for one imported record, or raise ValueError/ValidationError when it
+    cannot be imported. The change_seq is stamped when its chunk is written.
+    """
+    game = GameModel.model_validate(record)
+    # Only the fields present in the record overwrite an existing game; defaults fill new ones
+    fields = game.model_dump(by_alias=True, exclude_unset=True, exclude={"id"})
+    if "deleted" in fields:
+        fields.update(deletion_fields(fields["deleted"]))
+    if key == "_id":
+        if game.id is None or not ObjectId.is_valid(game.id):
+            raise ValueError("Record has no valid _id")
+        match = {"_id": ObjectId(game.id)}
+    else:
+        match = {"title": game.title, "deleted": False}
+
+    update = {"$set": fields}
+    if "custom_title" in fields:
+        fields.update(search_fields(game.title, game.custom_title))
+    else:
+        # Search fields also depend on the stored custom_title: recomputed after the import
+        update["$unset"] = {"search_key": "", "search_tokens": "", "search_version": ""}
+    defaults = {field: value for field, value in new_game_document(game).items() if field not in fields}
+    for field in ("search_key", "search_tokens", "search_version", "change_seq"):
+        defaults.pop(field, None)
+    if defaults:
+        update["$setOnInsert"] = defaults
+    return match, update
+
+@app.post("/games/import", tags=["Admin"])
+async def import_games(
+    request: Request,
+    format: Optional[Literal["ndjson", "json"]] = None,
+    key: Literal["title", "_id"] = "title",
+    chunk_size: int = Query(500, ge=1, le=10000),
+):
+    """
+    Import games from the request body, streamed: NDJSON (one game per line) or a JSON array,
+    chosen by `format` or else by the Content-Type. Records are validated against GameModel and
+    upserted by `key` in unordered bulk writes of `chunk_size`. The report has per-chunk results
+    and errors and the overall throughput.
+    """
+    if format is None:
+        format = "json" if request.headers.get("content-type", "").startswith("application/json") else "ndjson"
+    records = iter_json_array(request.stream()) if format == "json" else iter_ndjson(request.stream())
+    collection, counters = app.mongodb[COLLECTION_NAME], app.mongodb[META_COLLECTION_NAME]
+    started = time.monotonic()
+    chunks = []
+    totals = {"received": 0, "invalid": 0, "upserted": 0, "modified": 0, "failed": 0}
+
+    async def write_chunk(requests, errors):
+        report = {"chunk": len(chunks) + 1, "records": len(requests) + len(errors), "upserted": 0, "modified": 0}
+        if requests:
+            try:
+                # Numbers taken only now, so a slow upload does not hold back syncs (see sync.sync_limit)
+                async with change_seqs(counters, len(requests)) as first_seq:
+                    result = await collection.bulk_write(
+                        [
+                            UpdateOne(
+                                match, {**update, "$set": {**update["$set"], "change_seq": first_seq + offset}},
+                                upsert=True,
+                            )
+                            for offset, (_, (match, update)) in enumerate(requests)
+                        ],
+                        ordered=False,
+                    )
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for error in details.get("writeErrors", []):
+                    errors.append({"record": requests[error["index"]][0], "detail": error.get("errmsg")})
+                totals["failed"] += len(details.get("writeErrors", []))
+            report["upserted"] = details.get("nUpserted", 0)
+            report["modified"] = details.get("nModified", 0)
+            totals["upserted"] += report["upserted"]
+            totals["modified"] += report["modified"]
+        if errors:
+            report["errors"] = errors[:MAX_ERRORS_PER_CHUNK]
+            report["error_count"] = len(errors)
+        chunks.append(report)
+
+    requests, errors = [], []
+    try:
+        async for number, record in records:
+            totals["received"] += 1
+            try:
+                if isinstance(record, Exception):
+                    raise ValueError(f"Invalid JSON: {record}")
+                if not isinstance(record, dict):
+                    raise ValueError("Record is not an object")
+                requests.append((number, import_request(record, key)))
+            except (ValueError, ValidationError) as e:
+                totals["invalid"] += 1
+                errors.append({"record": number, "detail": str(e)})
+            if len(requests) + len(errors) >= chunk_size:
+                await write_chunk(requests, errors)
+                requests, errors = [], []
+    except ImportFormatError as e:
+        if not totals["received"]:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Keep what was read before the body broke off
+        totals["aborted"] = str(e)
+    if requests or errors:
+        await write_chunk(requests, errors)
+
+    if totals["upserted"] or totals["modified"]:
+        await backfill_search_fields(collection)
+        await rebuild_stats()
+        await rebuild_cube()
+        await library_changed()
+
+    elapsed = time.monotonic() - started
+    return {
+        **totals,
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(totals["received"] / elapsed, 1) if elapsed else None,
+        "chunks": chunks,
+    }
+
+async def settle_updates(collection, updates, matched):
+    """
+    Split the batch's (position, _id, change_seq) updates that may not have applied, knowing that `matched`
+    of them did, into (conflicts, unknown). A game still stamped with its update's change_seq was updated;
+    the others either matched nothing (written by another request since it was read) or were written again
+    after this update, which only the count can tell apart: `unknown` lists them when it cannot.
+    """
+    cursor = collection.find({"_id": {"$in": [object_id for _, object_id, _ in updates]}}, {"change_seq": 1})
+    stored = {game["_id"]: game.get("change_seq") async for game in cursor}
+    unsettled = [position for position, object_id, change_seq in updates if stored.get(object_id) != change_seq]
+    unsettled_matched = matched - (len(updates) - len(unsettled))
+    if unsettled_matched == 0:
+        return unsettled, []
+    if unsettled_matched == len(unsettled):
+        return [], []
+    return [], unsettled
+
+@app.post("/games/batch", tags=["Games"])
+async def batch_games(batch: BatchRequest):
+    """
+    Apply many creates, updates and soft deletes at once: one read of the affected games,
+    one unordered bulk_write, then a single stats update and version bump.
+    Failed operations are reported by index and do not stop the others. Updates and deletes only
+    apply to the game as it was read: one written by another request in between is reported as a conflict,
+    and as unknown in the rare case where whether it applied cannot be told.
+    """
+    collection = app.mongodb[COLLECTION_NAME]
+    results = [None] * len(batch.operations)
+
+    try:
+        targets = {
+            index: ObjectId(operation.id)
+            for index, operation in enumerate(batch.operations) if operation.op != "create"
+        }
+    except:
+        raise HTTPException(status_code=400, detail="Invalid game ID")
+
+    cursor = collection.find({"_id": {"$in": list(set(targets.values()))}})
+    read = {game["_id"]: game async for game in cursor}
+    # One change sequence number per operation (unused ones are just skipped), held until they are written
+    async with change_seqs(app.mongodb[META_COLLECTION_NAME], len(batch.operations)) as first_seq:
+        # The games as the operations before each one left them
+        current = dict(read)
+        created = []
+        # Every operation on one game goes into a single $set: the updates of an unordered bulk_write
+        # may run in any order. _id -> (merged $set, indexes of the operations merged in it)
+        merged = {}
+        for index, operation in enumerate(batch.operations):
+            before = current.get(targets.get(index))
+            if operation.op == "create":
+                if operation.game is None:
+                    results[index] = {"status": "error", "detail": "create needs 'game'"}
+                    continue
+                new_game = new_game_document(operation.game)
+                new_game["_id"] = ObjectId()
+                new_game["change_seq"] = first_seq + index
+                created.append((index, new_game))
+                results[index] = {"status": "created", "id": str(new_game["_id"])}
+                continue
+            if before is None or (operation.op == "delete" and before.get("deleted")):
+                results[index] = {"status": "not_found", "id": operation.id}
+                continue
+            if operation.op == "update":
+                if operation.changes is None:
+                    results[index] = {"status": "error", "detail": "update needs 'changes'"}
+                    continue
+                update_data = with_search_fields(operation.changes.model_dump(exclude_unset=True), before)
+                if not update_data:
+                    results[index] = {"status": "unchanged", "id": operation.id}
+                    continue
+                update_data = with_deletion_time(update_data)
+                results[index] = {"status": "updated", "id": operation.id}
+            else:
+                update_data = deletion_fields(True)
+                results[index] = {"status": "deleted", "id": operation.id}
+            update_data["change_seq"] = first_seq + index
+            update_set, indexes = merged.setdefault(before["_id"], ({}, []))
+            update_set.update(update_data)
+            indexes.append(index)
+            current[before["_id"]] = {**before, **update_data}
+
+        # Per request: the operations it carries, and the (before, after) of its game for the stats
+        # and facet cube deltas
+        requests, request_indexes, changes, written = [], [], [], []
+        for index, new_game in created:
+            requests.append(InsertOne(new_game))
+            request_indexes.append([index])
+            changes.append((None, new_game))
+            written.append(new_game["_id"])
+        for object_id, (update_set, indexes) in merged.items():
+            requests.append(UpdateOne(
+                {"_id": object_id, "change_seq": read[object_id].get("change_seq")}, {"$set": update_set}
+            ))
+            request_indexes.append(indexes)
+            changes.append((read[object_id], current[object_id]))
+            written.append(object_id)
+
+        failed = set()
+        if requests:
+            try:
+                matched = (await collection.bulk_write(requests, ordered=False)).matched_count
+            except BulkWriteError as e:
+                matched = e.details.get("nMatched", 0)
+                for error in e.details.get("writeErrors", []):
+                    failed.add(error["index"])
+                    for index in request_indexes[error["index"]]:
+                        results[index] = {"status": "error", "detail": error.get("errmsg")}
+
+    if requests:
+        updates = [
+            (position, written[position], changes[position][1]["change_seq"])
+            for position in range(len(created), len(requests)) if position not in failed
+        ]
+        unknown = []
+        if matched < len(updates):
+            conflicts, unknown = await settle_updates(collection, updates, matched)
+            for status, positions, detail in (
+                ("conflict", conflicts, "Game changed by another request; read it again"),
+                ("unknown", unknown, "Game written by another request around this one; read it to see if this applied"),
+            ):
+                for position in positions:
+                    failed.add(position)
+                    for index in request_indexes[position]:
+                        results[index] = {"status": status, "id": batch.operations[index].id, "detail": detail}
+
+        applied = [position for position in range(len(requests)) if position not in failed]
+        applied_count = sum(len(request_indexes[position]) for position in applied)
+        if unknown:
+            # What the unknown writes changed is not known: count again, reload the replica and clients
+            await rebuild_stats()
+            await rebuild_cube()
+            await library_changed()
+            return {"results": results, "applied": applied_count}
+        stats_change, cube_change = {}, {}
+        for before, after in (changes[position] for position in applied):
+            for total, delta in ((stats_change, stats_delta(before, after)), (cube_change, cube_delta(before, after))):
+                for key, change in delta.items():
+                    total[key] = total.get(key, 0) + change
+        await library_changed(
+            {field: change for field, change in stats_change.items() if change},
+            [written[position] for position in applied],
+            {cell: change for cell, change in cube_change.items() if change},
+            [changes[position] for position in applied],
+        )
+        return {"results": results, "applied": applied_count}
+
+    return {"results": results, "applied": 0}
+
+@app.post("/games/lookup", response_model=List[GameModel], tags=["Games"])
+async def lookup_games(lookup: LookupRequest):
+    """Fetch many games by ID with a single $in query, in the order requested. Unknown IDs are skipped."""
+    try:
+        object_ids = [ObjectId(game_id) for game_id in lookup.ids]
+    except:
+        raise HTTPException(status_code=400, detail="Invalid game ID")
+
+    cursor = app.mongodb[COLLECTION_NAME].find({"_id": {"$in": object_ids}})
+    games = {game["_id"]: game async for game in cursor}
+    return [games[object_id] for object_id in object_ids if object_id in games]
+
+@app.get("/games/{id}", response_model=GameModel, tags=["Games"])
+async def get_game(id: str, request: Request, response: Response):
+    """Get a single game, with an ETag computed from the document itself."""
+    try:
+        object_id = ObjectId(id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid game ID")
+
+    game = await app.mongodb[COLLECTION_NAME].find_one({"_id": object_id})
+    if not game:
+        raise HTTPException(status_code=404, detail=f"Game {id} not found")
+
+    # Internal fields (search tokens, random key...) change without the game changing
+    etag = document_etag({field: game.get(field) for field in GAME_FIELDS})
+    headers = validator_headers(etag)
+    if is_not_modified(request.headers, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return game
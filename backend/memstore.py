@@ -0,0 +1,258 @@
+"""
+In-memory replica of the library, opt-in with GAMES_MEMORY_REPLICA=1.
+
+The live games are loaded at startup into one small record per game (the public fields plus
+`search_key`) and inverted indexes: platform, genre and search token -> set of _ids, plus the
+played and DLC sets. GET /games, /games/random, /games/to-play and /stats are then answered from
+memory with the same results as the Mongo queries they replace. The sorted matches of a filter are
+kept until the next change, so a page is a bisect and a slice.
+
+It is kept in sync two ways:
+- write-through: every write route passes the _ids it wrote to `refresh`, which re-reads them;
+- a change stream on the games collection, for writes made by other workers or by scripts.
+  Without a replica set there is none; the caller then reloads the replica when the library
+  version moves (see caching.watch_version).
+"""
+import asyncio
+import logging
+import random
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from caching import CHANGE_STREAMS_UNSUPPORTED
+from search import fold, query_tokens, score
+from stats import stats_document
+
+logger = logging.getLogger("gameslist.memstore")
+
+LIVE_QUERY = {"deleted": False}
+# Sorted matches kept per filter; all dropped on any change
+MATCH_CACHE_SIZE = 256
+# Seconds before following the change stream again after an error
+RETRY_DELAY = 5.0
+
+_EMPTY = frozenset()
+
+
+class LibraryReplica:
+    def __init__(self, fields):
+        # Public fields kept per game, besides _id (the GameModel fields)
+        self.fields = tuple(field for field in fields if field != "_id")
+        self.ready = False
+        # Whether a change stream keeps this replica in sync with writes made elsewhere
+        self.following = False
+        self._reset()
+
+    def _reset(self):
+        self.games = {}
+        self.ids = []
+        self.tokens = defaultdict(set)
+        self.platforms = defaultdict(set)
+        self.genres = defaultdict(set)
+        self.played = set()
+        self.dlc = set()
+        self._matches = OrderedDict()
+        self._to_play = None
+
+    # Loading and updates
+
+    async def load(self, collection):
+        """(Re)load every live game. Reads keep using the previous copy until the new one is complete."""
+        projection = dict.fromkeys(self.fields + ("search_key", "search_tokens"), 1)
+        documents = await collection.find(LIVE_QUERY, projection).to_list(length=None)
+        # No await from here on: no request sees a half-built replica
+        self._reset()
+        for document in documents:
+            self._add(document)
+        self.ids = sorted(self.games)
+        self.ready = True
+        logger.info("Loaded %d games in memory", len(self.games))
+
+    async def refresh(self, collection, object_ids):
+        """Re-read the given games after a write (soft-deleted or missing ones are dropped)."""
+        object_ids = list(object_ids)
+        if not object_ids:
+            return
+        projection = dict.fromkeys(self.fields + ("search_key", "search_tokens", "deleted"), 1)
+        documents = await collection.find({"_id": {"$in": object_ids}}, projection).to_list(length=None)
+        found = {document["_id"]: document for document in documents}
+        for object_id in object_ids:
+            self.apply(object_id, found.get(object_id))
+
+    def apply(self, object_id, document):
+        """Replace one game with the stored document; None (or a soft-deleted one) removes it."""
+        if object_id in self.games:
+            self._remove(object_id)
+            if document is None or document.get("deleted"):
+                self.ids.pop(bisect_right(self.ids, object_id) - 1)
+        elif document is not None and not document.get("deleted"):
+            self.ids.insert(bisect_right(self.ids, object_id), object_id)
+        if document is not None and not document.get("deleted"):
+            self._add(document)
+        self._matches.clear()
+        self._to_play = None
+
+    def _add(self, document):
+        object_id = document["_id"]
+        record = {"_id": object_id, "search_key": document.get("search_key") or ""}
+        for field in self.fields:
+            record[field] = document.get(field)
+        record["search_tokens"] = tuple(document.get("search_tokens") or ())
+        self.games[object_id] = record
+        for token in record["search_tokens"]:
+            self.tokens[token].add(object_id)
+        for platform in record.get("platforms") or ():
+            self.platforms[platform].add(object_id)
+        for genre in record.get("genres") or ():
+            self.genres[genre].add(object_id)
+        if record.get("played"):
+            self.played.add(object_id)
+        if record.get("is_dlc"):
+            self.dlc.add(object_id)
+
+    def _remove(self, object_id):
+        record = self.games.pop(object_id)
+        for index, keys in (
+            (self.tokens, record["search_tokens"]),
+            (self.platforms, record.get("platforms") or ()),
+            (self.genres, record.get("genres") or ()),
+        ):
+            for key in keys:
+                members = index.get(key)
+                if members is not None:
+                    members.discard(object_id)
+                    if not members:
+                        del index[key]
+        self.played.discard(object_id)
+        self.dlc.discard(object_id)
+
+    async def follow(self, collection):
+        """
+        Background task: apply the changes of the games collection as they happen. Returns when the
+        server has no change streams (not a replica set), leaving `following` False.
+        """
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup") as stream:
+                    self.following = True
+                    # Changes made while the stream was not open
+                    await self.load(collection)
+                    async for change in stream:
+                        operation = change["operationType"]
+                        if operation in ("insert", "update", "replace"):
+                            self.apply(change["documentKey"]["_id"], change.get("fullDocument"))
+                        elif operation == "delete":
+                            self.apply(change["documentKey"]["_id"], None)
+                        else:
+                            # drop, rename, invalidate: start over
+                            break
+            except OperationFailure as e:
+                self.following = False
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("No change streams (not a replica set): reloading on library version changes")
+                    return
+                logger.warning("Replica change stream failed, retrying: %s", e)
+            except PyMongoError as e:
+                self.following = False
+                logger.warning("Replica change stream failed, retrying: %s", e)
+            await asyncio.sleep(RETRY_DELAY)
+
+    # Reads
+
+    def _matching(self, tokens, search, platform, genre, played, include_dlc):
+        """
+        Sorted matches of a filter: _ids in _id order, or (-score, _id) pairs in rank order when
+        there are search tokens. Same semantics as build_games_query.
+        """
+        if search and not tokens:
+            # A search with nothing searchable in it matches nothing
+            return []
+        key = (tuple(tokens), fold(search) if tokens else None, platform, genre, played, include_dlc)
+        matches = self._matches.get(key)
+        if matches is not None:
+            self._matches.move_to_end(key)
+            return matches
+
+        sets = [self.tokens.get(token, _EMPTY) for token in tokens]
+        if platform and platform != "all":
+            sets.append(self.platforms.get(platform, _EMPTY))
+        if genre and genre != "all":
+            sets.append(self.genres.get(genre, _EMPTY))
+        if sets:
+            sets.sort(key=len)
+            candidates = set(sets[0]).intersection(*sets[1:])
+        else:
+            candidates = None
+
+        def accepted(object_id):
+            if not include_dlc and object_id in self.dlc:
+                return False
+            return played is None or (object_id in self.played) == played
+
+        if tokens:
+            folded = key[1]
+            games = self.games
+            matches = sorted(
+                (-score(games[object_id]["search_key"], folded, tokens), object_id)
+                for object_id in candidates if accepted(object_id)
+            )
+        elif candidates is None:
+            matches = [object_id for object_id in self.ids if accepted(object_id)]
+        else:
+            matches = sorted(object_id for object_id in candidates if accepted(object_id))
+
+        self._matches[key] = matches
+        while len(self._matches) > MATCH_CACHE_SIZE:
+            self._matches.popitem(last=False)
+        return matches
+
+    def page(self, search, platform, genre, played, include_dlc, position, skip, limit):
+        """
+        (total, games) for GET /games, one game more than `limit` when there is a next page.
+        Ranked games are copies carrying their `_score`, as the aggregation returns them.
+        """
+        tokens = query_tokens(search) if search else []
+        matches = self._matching(tokens, search, platform, genre, played, include_dlc)
+        if tokens:
+            start = bisect_right(matches, (-position["s"], position["id"])) if position else skip
+            games = [
+                {**self.games[object_id], "_score": -rank}
+                for rank, object_id in matches[start:start + limit + 1]
+            ]
+        else:
+            start = bisect_right(matches, position["id"]) if position else skip
+            games = [self.games[object_id] for object_id in matches[start:start + limit + 1]]
+        return len(matches), games
+
+    def pick_random(self, search, platform, genre, played, count=1, exclude=()):
+        """Same contract as sampling.pick_random, DLC included."""
+        tokens = query_tokens(search) if search else []
+        matches = self._matching(tokens, search, platform, genre, played, True)
+        excluded = set(exclude)
+        object_ids = [match[1] for match in matches] if tokens else matches
+        if excluded:
+            object_ids = [object_id for object_id in object_ids if object_id not in excluded]
+        return [self.games[object_id] for object_id in random.sample(object_ids, min(count, len(object_ids)))]
+
+    def to_play(self):
+        """The to-play list in TO_PLAY_SORT order (missing orders first, as Mongo sorts null)."""
+        if self._to_play is None:
+            self._to_play = sorted(
+                (game for game in self.games.values() if game.get("to_play")),
+                key=lambda game: (game.get("to_play_order") is not None, game.get("to_play_order") or 0, game["_id"]),
+            )
+        return self._to_play
+
+    def to_play_ids(self):
+        return [game["_id"] for game in self.to_play()]
+
+    def stats(self):
+        """Stats document (see stats.py) of the games in memory."""
+        return stats_document(
+            len(self.games),
+            len(self.played),
+            {platform: len(members) for platform, members in self.platforms.items()},
+            {genre: len(members) for genre, members in self.genres.items()},
+        )
@@ -0,0 +1,200 @@
+"""
+Prometheus metrics for GET /metrics.
+
+- HTTP: latency histogram per route template, method and status, plus requests in flight,
+  recorded by a pure ASGI middleware (the route template keeps the label set small:
+  /games/{id}, not one series per game). Event streams (GET /events) stay open for hours: they
+  are counted apart, in open event streams, and left out of both.
+- MongoDB: command durations per collection and command name, and connection pool checkout
+  waits, recorded by PyMongo event listeners passed to the Motor client.
+- Single flight: reads that ran a query vs reads that shared one already in flight (see
+  singleflight.py); the coalescing hit rate is coalesced / (leader + coalesced).
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR (an empty directory shared by the
+workers, as the Dockerfile does) so that a scrape of any worker reports the sum of all of them.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from pymongo import monitoring
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+REQUEST_DURATION = Histogram(
+    "gameslist_http_request_duration_seconds",
+    "Time to answer an HTTP request, body included",
+    ["method", "route", "status"],
+    buckets=HTTP_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "gameslist_http_requests_in_flight",
+    "HTTP requests being answered",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+EVENT_STREAMS_OPEN = Gauge(
+    "gameslist_http_event_streams_open",
+    "Server-Sent Events responses being streamed",
+    multiprocess_mode="livesum",
+)
+COMMAND_DURATION = Histogram(
+    "gameslist_mongo_command_duration_seconds",
+    "MongoDB command round trips, as reported by the driver",
+    ["collection", "command"],
+    buckets=MONGO_BUCKETS,
+)
+COMMAND_FAILURES = Counter(
+    "gameslist_mongo_command_failures_total",
+    "MongoDB commands that returned an error",
+    ["collection", "command"],
+)
+CHECKOUT_WAIT = Histogram(
+    "gameslist_mongo_pool_checkout_seconds",
+    "Time spent waiting for a connection from the driver pool",
+    buckets=MONGO_BUCKETS,
+)
+CHECKOUT_FAILURES = Counter(
+    "gameslist_mongo_pool_checkout_failures_total",
+    "Connection checkouts that failed",
+    ["reason"],
+)
+
+COALESCED_READS = Counter(
+    "gameslist_singleflight_requests_total",
+    "Reads through the single-flight layer: `leader` ran the query, `coalesced` shared one in flight",
+    ["endpoint", "result"],
+)
+
+# Commands whose first field is not the collection name
+_NO_COLLECTION = {"getMore": "collection"}
+
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def render():
+    """Current metrics as (body, content type)."""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def process_exited():
+    """Call when a worker stops, so its live gauges leave the merged metrics."""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        event_stream = False
+
+        async def send_with_status(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                event_stream = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+                if event_stream:
+                    in_flight.dec()
+                    EVENT_STREAMS_OPEN.inc()
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if event_stream:
+                EVENT_STREAMS_OPEN.dec()
+            else:
+                in_flight.dec()
+                # The router stores the matched route in the scope; unmatched paths share one label
+                route = scope.get("route")
+                REQUEST_DURATION.labels(
+                    method, getattr(route, "path", "unmatched"), str(status)
+                ).observe(time.perf_counter() - started)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Durations of every command sent by the driver, by collection and command name."""
+
+    def __init__(self):
+        # Collection of the commands in flight, by request id (the finish events do not carry it)
+        self._collections = {}
+
+    def started(self, event):
+        field = _NO_COLLECTION.get(event.command_name, event.command_name)
+        collection = event.command.get(field)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection checkout waits; only the checkout events matter here."""
+
+    def connection_checked_out(self, event):
+        # `duration` is reported by PyMongo 4.7 and later
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            CHECKOUT_WAIT.observe(duration)
+
+    def connection_check_out_failed(self, event):
+        CHECKOUT_FAILURES.labels(str(event.reason)).inc()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+def event_listeners():
+    """Listeners to pass to the Motor client."""
+    return [CommandMetrics(), PoolMetrics()]
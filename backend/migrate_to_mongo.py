@@ -4,7 +4,7 @@ import os
 import sys
 
 # Configuration
-MONGO_URI = os.getenv("MONGO_URL", "mongodb://localhost:27019/")
+MONGO_URI = os.getenv("MONGO_URL", "mongodb://localhost:27019/?directConnection=true")
 DB_NAME = os.getenv("MONGO_DB_NAME", "games_library")
 COLLECTION_NAME = "games"
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -42,11 +42,30 @@ def migrate():
     collection.drop()
     print("Dropped existing collection.")
 
+    # Reads filter on both flags by equality: store them as booleans, as the API does (see archiving.normalize_flags)
+    for game in data:
+        for field in ("deleted", "is_dlc"):
+            game[field] = game.get(field) is True
+
     if data:
         result = collection.insert_many(data)
         print(f"Successfully inserted {len(result.inserted_ids)} documents.")
     else:
         print("No data to insert.")
 
+    # Stats and the facet cube are maintained incrementally by the API; drop them so it rebuilds them from the new data
+    db["meta"].delete_one({"_id": "stats"})
+    db["facet_cube"].drop()
+    # New library version (see caching.bump_version): ETags change, so clients and the API's caches drop what they hold
+    db["meta"].update_one(
+        {"_id": "games"}, {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}}, upsert=True
+    )
+    # The new games carry no change_seq: raise the archive floor (see sync.invalidate_syncs) past every
+    # number handed out, so clients get 410 on GET /games/changes and sync again from since=0
+    counter = db["meta"].find_one_and_update(
+        {"_id": "change_seq"}, {"$inc": {"seq": 1}}, upsert=True, return_document=pymongo.ReturnDocument.AFTER
+    )
+    db["meta"].update_one({"_id": "archive"}, {"$max": {"change_seq": counter["seq"]}}, upsert=True)
+
 if __name__ == "__main__":
     migrate()
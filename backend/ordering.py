@@ -0,0 +1,136 @@
+"""
+Gap-based ordering of the "to play" list.
+
+Consecutive games are ORDER_GAP apart in `to_play_order`, so moving a game only rewrites that
+game (it takes the midpoint between its new neighbours). When two neighbours get too close the
+whole list is renumbered with a single bulk_write; the periodic rebalance does the same ahead of time.
+
+Appending takes its order from a counter document (one atomic `$inc`), so concurrent appends
+never read the same "highest order" and never get the same value.
+"""
+import asyncio
+import logging
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+
+from sync import change_seqs
+
+logger = logging.getLogger("gameslist.ordering")
+
+ORDER_GAP = 1024
+# Renumber during the periodic check once any two neighbours are closer than this
+MIN_GAP = 8
+
+TO_PLAY_QUERY = {"to_play": True, "deleted": False}
+TO_PLAY_SORT = [("to_play_order", ASCENDING), ("_id", ASCENDING)]
+
+# Counter document (in the meta collection) always at or above the highest to_play_order
+COUNTER_ID = "to_play_order"
+
+
+async def allocate_order(counters):
+    """Next free order at the end of the list, in one atomic round trip."""
+    counter = await counters.find_one_and_update(
+        {"_id": COUNTER_ID},
+        {"$inc": {"seq": ORDER_GAP}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["seq"]
+
+
+async def seed_order_counter(collection, counters):
+    """Raise the counter to the highest existing order (lists built before the counter existed)."""
+    highest = await collection.find_one(
+        {**TO_PLAY_QUERY, "to_play_order": {"$ne": None}},
+        {"to_play_order": 1},
+        sort=[("to_play_order", DESCENDING)],
+    )
+    await counters.update_one(
+        {"_id": COUNTER_ID},
+        {"$max": {"seq": highest["to_play_order"] if highest else 0}},
+        upsert=True,
+    )
+
+
+async def reorder(collection, counters, object_ids):
+    """Give the games ORDER_GAP-spaced orders following the given sequence, in one round trip."""
+    if not object_ids:
+        return 0
+    # Appends go after the renumbered list, not between its games
+    await counters.update_one(
+        {"_id": COUNTER_ID}, {"$max": {"seq": len(object_ids) * ORDER_GAP}}, upsert=True
+    )
+    async with change_seqs(counters, len(object_ids)) as first_seq:
+        result = await collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": object_id},
+                    {"$set": {"to_play_order": position * ORDER_GAP, "change_seq": first_seq + position - 1}},
+                )
+                for position, object_id in enumerate(object_ids, start=1)
+            ],
+            ordered=False,
+        )
+    return result.matched_count
+
+
+async def rebalance(collection, counters):
+    """Renumber the whole to-play list with even gaps, keeping the current order."""
+    cursor = collection.find(TO_PLAY_QUERY, {"_id": 1}).sort(TO_PLAY_SORT)
+    object_ids = [game["_id"] async for game in cursor]
+    await reorder(collection, counters, object_ids)
+    return len(object_ids)
+
+
+async def needs_rebalance(collection):
+    cursor = collection.find(TO_PLAY_QUERY, {"to_play_order": 1, "_id": 0}).sort(TO_PLAY_SORT)
+    previous = None
+    async for game in cursor:
+        order = game.get("to_play_order")
+        if order is None or (previous is not None and order - previous < MIN_GAP):
+            return True
+        previous = order
+    return False
+
+
+async def order_between(collection, counters, after_id, before_id):
+    """
+    (order, rebalanced): an order value strictly between the game `after_id` (None: top of the list)
+    and the game `before_id` (None: bottom of the list), and whether the list had to be renumbered
+    first for lack of room. Raises LookupError when a neighbour is not in the to-play list.
+    """
+    if before_id is None:
+        # Moving to the bottom is an append
+        if after_id is not None and not await collection.find_one({**TO_PLAY_QUERY, "_id": after_id}, {"_id": 1}):
+            raise LookupError("Neighbour is not in the to play list")
+        return await allocate_order(counters), False
+
+    for attempt in range(2):
+        neighbours = [object_id for object_id in (after_id, before_id) if object_id is not None]
+        cursor = collection.find({**TO_PLAY_QUERY, "_id": {"$in": neighbours}}, {"to_play_order": 1})
+        orders = {game["_id"]: game.get("to_play_order") async for game in cursor}
+        if any(orders.get(object_id) is None for object_id in neighbours):
+            raise LookupError("Neighbour is not in the to play list")
+
+        low = orders[after_id] if after_id is not None else 0
+        high = orders[before_id]
+        if high - low >= 2:
+            return (low + high) // 2, attempt > 0
+        if attempt == 0:
+            await rebalance(collection, counters)
+    raise LookupError("Neighbours are not in list order")
+
+
+async def rebalance_periodically(collection, counters, interval, on_rebalanced=None):
+    """Background task: renumber the list whenever gaps got too small since the last check."""
+    while True:
+        try:
+            if await needs_rebalance(collection):
+                count = await rebalance(collection, counters)
+                logger.info("Rebalanced to play list (%d games)", count)
+                if on_rebalanced:
+                    await on_rebalanced()
+        except Exception:
+            logger.exception("To play list rebalance failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,62 @@
+"""
+Opaque keyset cursors for GET /games.
+
+A cursor holds the sort key of the last game of a page (plus its _id as tie-breaker) and a
+fingerprint of the filter it was issued for. The next page starts right after that key, so
+every page costs the same index walk instead of skipping over all the previous ones.
+"""
+import base64
+import hashlib
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from caching import canonical_filter
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def query_fingerprint(query):
+    """Short stable hash of a Mongo filter, so a cursor cannot be replayed against another filter."""
+    return hashlib.sha1(canonical_filter(query).encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(game, query, score_field=None):
+    payload = {"id": str(game["_id"]), "f": query_fingerprint(query)}
+    if score_field:
+        payload["s"] = game[score_field]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, query):
+    """Return the cursor payload with `id` as ObjectId; raise InvalidCursor if it is malformed or stale."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        payload["id"] = ObjectId(payload["id"])
+    except (ValueError, TypeError, KeyError, InvalidId):
+        raise InvalidCursor("Malformed cursor")
+    if "s" in payload and (not isinstance(payload["s"], (int, float)) or isinstance(payload["s"], bool)):
+        raise InvalidCursor("Malformed cursor")
+    if payload.get("f") != query_fingerprint(query):
+        raise InvalidCursor("Cursor does not belong to this filter")
+    return payload
+
+
+def after_id(cursor):
+    """Keyset condition for listings ordered by _id ascending."""
+    return {"_id": {"$gt": cursor["id"]}}
+
+
+def after_score(cursor, score_field):
+    """Keyset condition for listings ordered by score descending, then _id ascending."""
+    if "s" not in cursor:
+        raise InvalidCursor("Cursor does not belong to a ranked search")
+    return {"$or": [
+        {score_field: {"$lt": cursor["s"]}},
+        {score_field: cursor["s"], "_id": {"$gt": cursor["id"]}},
+    ]}
@@ -0,0 +1,236 @@
+"""
+Slow query log.
+
+A PyMongo command listener watches the reads sent to the games collection. Any that take longer
+than SLOW_QUERY_MS are written to a capped collection with their query shape (the filter with its
+values replaced by "?", so that searches for different titles group together) and a summary of
+`explain("executionStats")`: plan stages, index used, keys and documents examined vs returned.
+Each shape is explained at most once per EXPLAIN_INTERVAL. Aggregations that write ($merge, $out)
+are not logged, since explaining them with executionStats would run the write again, and neither
+are commands sent with UNLOGGED_COMMENT (deliberate full index scans, see warmup.py).
+
+`query_report` joins these shapes with `$indexStats` for GET /admin/queries.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from caching import canonical_filter
+
+logger = logging.getLogger("gameslist.profiling")
+
+SLOW_QUERY_MS = float(os.getenv("GAMES_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_BYTES = int(os.getenv("GAMES_SLOW_QUERY_LOG_BYTES", str(8 * 1024 * 1024)))
+# Seconds before the same shape is explained again
+EXPLAIN_INTERVAL = float(os.getenv("GAMES_EXPLAIN_INTERVAL", "60"))
+
+SLOW_QUERIES_COLLECTION = "slow_queries"
+WATCHED_COMMANDS = ("find", "aggregate", "count", "distinct")
+# Pipeline stages that write: explain("executionStats") would run them
+WRITE_STAGES = ("$merge", "$out")
+# `comment` of the commands to leave out of the log
+UNLOGGED_COMMENT = "gameslist:unlogged"
+# Parts of a command that are not values to hide from the shape
+KEPT_FIELDS = ("sort", "$sort", "projection", "$project", "key")
+
+
+def query_shape(value):
+    """The filter/pipeline with every literal value replaced by "?"."""
+    if isinstance(value, dict):
+        return {
+            field: inner if field in KEPT_FIELDS else query_shape(inner)
+            for field, inner in value.items()
+        }
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        # $and/$or branches and pipeline stages keep their structure; lists of values do not
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+def command_shape(command_name, command):
+    if command_name == "find":
+        return {"filter": query_shape(command.get("filter", {})), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        return {"pipeline": query_shape(command.get("pipeline", []))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "filter": query_shape(command.get("query", {}))}
+    return {"filter": query_shape(command.get("query", {}))}
+
+
+def _find_key(document, key):
+    """First value of `key` anywhere in a (nested) explain document."""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        values = document.values()
+    elif isinstance(document, list):
+        values = document
+    else:
+        return None
+    for value in values:
+        found = _find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_stages(plan, stages, indexes):
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    if "indexName" in plan:
+        indexes.append(plan["indexName"])
+    for child in ("inputStage", "queryPlan"):
+        _plan_stages(plan.get(child), stages, indexes)
+    for child in plan.get("inputStages", []):
+        _plan_stages(child, stages, indexes)
+
+
+def explain_summary(explain):
+    """The parts of an executionStats explain worth keeping: plan stages, indexes, work done."""
+    stages, indexes = [], []
+    _plan_stages(_find_key(explain, "winningPlan"), stages, indexes)
+    stats = _find_key(explain, "executionStats") or {}
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "collection_scan": "COLLSCAN" in stages,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """
+    Command listener recording slow reads on one collection. The driver may call it from other
+    threads, so the writes to Mongo are handed to the event loop given to `attach`.
+    """
+
+    def __init__(self, collection_name, threshold_ms=SLOW_QUERY_MS):
+        self.collection_name = collection_name
+        self.threshold_ms = threshold_ms
+        self._database = None
+        self._loop = None
+        self._started = {}
+        self._explained_at = {}
+        self._tasks = set()
+
+    async def attach(self, database):
+        """Start recording into the capped collection of `database` (created when missing)."""
+        try:
+            await database.create_collection(
+                SLOW_QUERIES_COLLECTION, capped=True, size=SLOW_QUERY_LOG_BYTES
+            )
+        except CollectionInvalid:
+            pass
+        self._database = database
+        self._loop = asyncio.get_running_loop()
+
+    def started(self, event):
+        if (
+            self._database is None
+            or event.command_name not in WATCHED_COMMANDS
+            or event.command.get(event.command_name) != self.collection_name
+            or event.command.get("comment") == UNLOGGED_COMMENT
+            or any(stage in WRITE_STAGES for step in event.command.get("pipeline", ()) for stage in step)
+        ):
+            return
+        # Only the command itself: no session, cluster time or read preference fields
+        self._started[event.request_id] = {
+            field: value for field, value in event.command.items()
+            if not field.startswith("$") and field not in ("lsid", "txnNumber")
+        }
+
+    def succeeded(self, event):
+        command = self._started.pop(event.request_id, None)
+        if command is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.threshold_ms:
+            self._loop.call_soon_threadsafe(self._schedule, event.command_name, command, duration_ms)
+
+    def failed(self, event):
+        self._started.pop(event.request_id, None)
+
+    def _schedule(self, command_name, command, duration_ms):
+        task = self._loop.create_task(self._record(command_name, command, duration_ms))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _record(self, command_name, command, duration_ms):
+        shape = command_shape(command_name, command)
+        shape_id = hashlib.sha1(f"{command_name}:{canonical_filter(shape)}".encode()).hexdigest()[:16]
+        entry = {
+            "at": datetime.now(timezone.utc),
+            "shape_id": shape_id,
+            "command": command_name,
+            "shape": canonical_filter(shape),
+            "duration_ms": round(duration_ms, 1),
+            "plan": None,
+        }
+        try:
+            now = time.monotonic()
+            if now - self._explained_at.get(shape_id, float("-inf")) >= EXPLAIN_INTERVAL:
+                self._explained_at[shape_id] = now
+                if command_name == "find":
+                    # find's cursor options have no meaning for explain
+                    command = {field: value for field, value in command.items() if field != "batchSize"}
+                explain = await self._database.command(
+                    {"explain": command, "verbosity": "executionStats"}
+                )
+                entry["plan"] = explain_summary(explain)
+            await self._database[SLOW_QUERIES_COLLECTION].insert_one(entry)
+        except PyMongoError as e:
+            logger.warning("Could not record slow %s (%s): %s", command_name, shape_id, e)
+
+
+async def query_report(collection, database, limit=20):
+    """Index usage since the last restart of mongod, and the slowest logged query shapes."""
+    indexes = [
+        {
+            "name": index["name"],
+            "key": index.get("key"),
+            "ops": index["accesses"]["ops"],
+            "since": index["accesses"]["since"],
+        }
+        async for index in collection.aggregate([{"$indexStats": {}}])
+    ]
+    indexes.sort(key=lambda index: index["ops"])
+
+    shapes = await database[SLOW_QUERIES_COLLECTION].aggregate([
+        {"$sort": {"at": 1}},
+        {"$group": {
+            "_id": "$shape_id",
+            "command": {"$last": "$command"},
+            "shape": {"$last": "$shape"},
+            "count": {"$sum": 1},
+            "max_ms": {"$max": "$duration_ms"},
+            "avg_ms": {"$avg": "$duration_ms"},
+            "last_seen": {"$max": "$at"},
+            # Null when the last occurrences were not explained: the latest explained one wins
+            "plans": {"$push": "$plan"},
+        }},
+        {"$sort": {"max_ms": -1}},
+        {"$limit": limit},
+    ]).to_list(length=None)
+    for shape in shapes:
+        shape["shape_id"] = shape.pop("_id")
+        plans = [plan for plan in shape.pop("plans") if plan]
+        shape["plan"] = plans[-1] if plans else None
+        shape["avg_ms"] = round(shape["avg_ms"], 1)
+
+    return {
+        "unused_indexes": [index["name"] for index in indexes if index["ops"] == 0 and index["name"] != "_id_"],
+        "indexes": indexes,
+        "collection_scans": [shape["shape_id"] for shape in shapes if shape["plan"] and shape["plan"]["collection_scan"]],
+        "slow_queries": shapes,
+    }
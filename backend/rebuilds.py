@@ -0,0 +1,72 @@
+"""
+Rebuilds of the documents derived from the games collection: the stats document (stats.py) and
+the facet cube (facets.py).
+
+Writes keep them current with deltas, so two things can go wrong while one is rebuilt from a scan:
+another worker rebuilding it at the same time (every worker finds the cube empty at startup), and
+writes whose deltas land while the scan runs, which the rebuilt counts may lose. A lease document in
+the meta collection lets one rebuild of each run at a time, and a rebuild during which the library
+moved (change_seq counter or library version) is run again.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from caching import VERSION_DOCUMENT_ID
+from sync import COUNTER_ID
+
+logger = logging.getLogger("gameslist.rebuilds")
+
+# Seconds a lease is held before another worker may take it over (its holder died)
+LEASE_SECONDS = float(os.getenv("GAMES_REBUILD_LEASE_SECONDS", "300"))
+# Seconds between attempts to take a lease held elsewhere
+LEASE_POLL_INTERVAL = 0.5
+# Rebuilds of one request while writes keep racing them
+REBUILD_ATTEMPTS = 3
+
+
+async def _acquire(meta_collection, name, owner):
+    now = datetime.now(timezone.utc)
+    try:
+        await meta_collection.update_one(
+            {"_id": f"lease:{name}", "until": {"$lt": now}},
+            {"$set": {"owner": owner, "until": now + timedelta(seconds=LEASE_SECONDS)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Held, and not expired
+        return False
+    return True
+
+
+async def _library_position(meta_collection):
+    """Change sequence counter (moved before a write) and library version (moved after it)."""
+    docs = meta_collection.find({"_id": {"$in": [COUNTER_ID, VERSION_DOCUMENT_ID]}})
+    return {doc["_id"]: doc.get("seq", doc.get("version")) async for doc in docs}
+
+
+async def rebuild_exclusively(meta_collection, name, build, needed=None):
+    """
+    Run `build()` (a coroutine function) under the lease `name`, after any rebuild of it running
+    elsewhere. With `needed`, skip it when `await needed()` is false once the lease is held: another
+    worker may have just rebuilt. Returns whether it ran.
+    """
+    owner = ObjectId()
+    while not await _acquire(meta_collection, name, owner):
+        await asyncio.sleep(LEASE_POLL_INTERVAL)
+    try:
+        if needed is not None and not await needed():
+            return False
+        for _ in range(REBUILD_ATTEMPTS):
+            position = await _library_position(meta_collection)
+            await build()
+            if await _library_position(meta_collection) == position:
+                return True
+        logger.warning("Rebuilt %s while the library kept changing: the writes in flight may be miscounted", name)
+        return True
+    finally:
+        await meta_collection.delete_one({"_id": f"lease:{name}", "owner": owner})
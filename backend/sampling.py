@@ -0,0 +1,99 @@
+"""
+Index-backed random selection.
+
+Every game carries a uniformly distributed `random_key`. Picking a random game is a seek to the
+first key at or after a random point (wrapping around to the smallest key), which an index on
+the filter fields plus `random_key` answers without scanning or sorting the matching documents.
+
+A game is picked with a probability proportional to the gap before its key, so picked games are
+moved to new random positions, keeping one unlucky gap from favouring the same game every time.
+That write is kept off the request path: picks are remembered and re-keyed by a background task.
+"""
+import asyncio
+import logging
+import os
+import random
+
+from pymongo import ASCENDING
+
+logger = logging.getLogger("gameslist.sampling")
+
+# Seconds between re-keyings of the games picked in the meantime
+REKEY_INTERVAL = float(os.getenv("GAMES_RANDOM_REKEY_INTERVAL", "60"))
+# Picks remembered between two re-keyings; past it, picks are not recorded until the next one
+MAX_PENDING_REKEYS = 10000
+
+# _ids of the games picked by this worker since the last re-keying
+_picked_since_rekey = set()
+
+
+def new_random_key():
+    return random.random()
+
+
+async def _seek(collection, query):
+    point = random.random()
+    game = await collection.find_one(
+        {**query, "random_key": {"$gte": point}}, sort=[("random_key", ASCENDING)]
+    )
+    if game is None:
+        # Past the largest key: wrap around
+        game = await collection.find_one(
+            {**query, "random_key": {"$lt": point}}, sort=[("random_key", ASCENDING)]
+        )
+    return game
+
+
+async def pick_random(collection, query, count=1, exclude=()):
+    """Up to `count` distinct random games matching `query`, none of them in `exclude`, in random order."""
+    excluded = set(exclude)
+    picked = {}
+    while len(picked) < count:
+        round_query = dict(query)
+        if excluded or picked:
+            round_query["_id"] = {"$nin": list(excluded | picked.keys())}
+        found = await asyncio.gather(*(_seek(collection, round_query) for _ in range(count - len(picked))))
+        found = [game for game in found if game is not None]
+        if not found:
+            # Every matching game has been picked or excluded
+            break
+        # Seeks of the same round can land on the same game; every round adds at least one new one
+        for game in found:
+            picked.setdefault(game["_id"], game)
+
+    games = list(picked.values())[:count]
+    random.shuffle(games)
+    if len(_picked_since_rekey) < MAX_PENDING_REKEYS:
+        _picked_since_rekey.update(game["_id"] for game in games)
+    return games
+
+
+async def rekey_picked(collection):
+    """Move the games picked since the last call to new random positions; returns how many."""
+    object_ids = list(_picked_since_rekey)
+    _picked_since_rekey.clear()
+    if object_ids:
+        await collection.update_many(
+            {"_id": {"$in": object_ids}},
+            [{"$set": {"random_key": {"$rand": {}}}}],
+        )
+    return len(object_ids)
+
+
+async def rekey_periodically(collection, interval=REKEY_INTERVAL):
+    """Background task: re-key the picked games every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await rekey_picked(collection)
+        except Exception:
+            logger.exception("Re-keying picked games failed")
+
+
+async def backfill_random_keys(collection):
+    """Assign a random key to games stored before random keys existed (or inserted by scripts)."""
+    result = await collection.update_many(
+        {"random_key": {"$exists": False}},
+        [{"$set": {"random_key": {"$rand": {}}}}],
+    )
+    return result.modified_count
@@ -0,0 +1,113 @@
+"""
+Token search for game titles.
+
+Every game stores a folded copy of its display title (`search_key`) and the prefixes of every
+word of `title` and `custom_title` (`search_tokens`, multikey and indexed). A search then becomes
+an index lookup on exact tokens instead of an unanchored regex over the whole collection.
+"""
+import re
+import unicodedata
+
+from pymongo import UpdateOne
+
+# Longest prefix stored per word; longer query words are truncated to it
+MAX_TOKEN_LENGTH = 20
+# Bound the work per query, whatever the user types
+MAX_QUERY_TOKENS = 8
+
+# Stored with the search fields; bumped whenever fold() changes, so that backfill_search_fields recomputes them
+SEARCH_FIELDS_VERSION = 2
+
+# Anything but letters and digits, in any script
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def fold(text):
+    """
+    Lowercase, strip diacritics and collapse punctuation: 'Pokémon: Édition' -> 'pokemon edition'.
+    Letters without a decomposition ('ø', Cyrillic, kana...) are kept as they are.
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", stripped.casefold()).strip()
+
+
+def tokenize(text):
+    return fold(text).split()
+
+
+def search_fields(title, custom_title=None):
+    """Derived fields to store on a game document whenever its title or custom_title changes."""
+    prefixes = set()
+    for word in tokenize(title) + tokenize(custom_title):
+        word = word[:MAX_TOKEN_LENGTH]
+        prefixes.update(word[:i] for i in range(1, len(word) + 1))
+    return {
+        "search_key": fold(custom_title or title),
+        "search_tokens": sorted(prefixes),
+        "search_version": SEARCH_FIELDS_VERSION,
+    }
+
+
+def query_tokens(search):
+    """Tokens to match for a user search string, longest (most selective) first. Empty if nothing searchable."""
+    tokens = {word[:MAX_TOKEN_LENGTH] for word in tokenize(search)}
+    return sorted(tokens, key=lambda t: (-len(t), t))[:MAX_QUERY_TOKENS]
+
+
+def match_clause(tokens):
+    """Mongo filter matching games that contain every query token as a word prefix."""
+    return {"search_tokens": {"$all": tokens}}
+
+
+def score_expression(search, tokens):
+    """
+    Aggregation expression ranking matches: exact title first, then titles starting with the
+    query, then shorter titles (where the query covers a larger share of the words).
+    """
+    folded = fold(search)
+    key = {"$ifNull": ["$search_key", ""]}
+    word_count = {"$size": {"$split": [key, " "]}}
+    return {"$add": [
+        {"$cond": [{"$eq": [key, folded]}, 4, 0]},
+        {"$cond": [{"$eq": [{"$substrCP": [key, 0, len(folded)]}, folded]}, 2, 0]},
+        {"$divide": [len(tokens), {"$max": [word_count, len(tokens)]}]},
+    ]}
+
+
+def score(search_key, folded, tokens):
+    """score_expression evaluated in Python, for games held in memory (see memstore.py)."""
+    key = search_key or ""
+    return (
+        (4 if key == folded else 0)
+        + (2 if key[:len(folded)] == folded else 0)
+        + len(tokens) / max(len(key.split(" ")), len(tokens))
+    )
+
+
+async def backfill_search_fields(collection, batch_size=500):
+    """
+    Compute search fields for games stored before search indexing existed (or inserted by scripts), or
+    folded by an older version of fold().
+    """
+    cursor = collection.find(
+        {"$or": [{"search_tokens": {"$exists": False}}, {"search_version": {"$ne": SEARCH_FIELDS_VERSION}}]},
+        {"title": 1, "custom_title": 1},
+    )
+    updated = 0
+    batch = []
+    async for game in cursor:
+        batch.append(UpdateOne(
+            {"_id": game["_id"]},
+            {"$set": search_fields(game.get("title"), game.get("custom_title"))},
+        ))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
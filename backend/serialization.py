@@ -0,0 +1,71 @@
+"""
+Fast response path for documents read from our own collection.
+
+Routes returning plain dicts go through `response_model` validation: one GameModel per document,
+ObjectId converted through BeforeValidator, then jsonable_encoder and json.dumps. Documents we
+stored ourselves do not need re-validating, so the hot listing routes only project them onto the
+public fields (filling model defaults) and hand them to orjson. The JSON is the same.
+
+It also encodes the streamed exports of GET /games/export, one batch of documents at a time.
+"""
+import csv
+import io
+
+import orjson
+from bson import ObjectId
+from starlette.responses import Response
+
+
+def _default(value):
+    # orjson calls this only for types it does not know; in our documents that is ObjectId
+    if value.__class__ is ObjectId:
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {value.__class__.__name__}")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def make_projector(fields, defaults):
+    """Function mapping a stored document to the given public fields, with defaults for missing ones."""
+    pairs = tuple((field, defaults[field]) for field in fields)
+
+    def project(doc):
+        get = doc.get
+        return {field: get(field, default) for field, default in pairs}
+
+    return project
+
+
+def ndjson_chunk(games):
+    return b"".join(dumps(game) + b"\n" for game in games)
+
+
+def csv_chunk(games, fields, header=False):
+    """CSV rows for the given games; list fields are joined with '; '."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    for game in games:
+        writer.writerow([
+            "; ".join(str(item) for item in value) if isinstance(value, list)
+            else "" if value is None
+            else str(value)
+            for value in (game[field] for field in fields)
+        ])
+    return buffer.getvalue().encode("utf-8")
+
+
+def json_array_chunk(games, first=False):
+    """Part of a JSON array: the caller sends b"[" before the first chunk and b"]" after the last."""
+    body = b",".join(dumps(game) for game in games)
+    return body if first or not body else b"," + body
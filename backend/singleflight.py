@@ -0,0 +1,43 @@
+"""
+Single-flight coalescing of identical reads.
+
+Concurrent requests for the same key (e.g. the same GET /games filter and page, opened in many tabs
+at once) share one in-flight Mongo operation and its result instead of each running it. Nothing is
+kept once the operation completes: this is not a cache, only duplicate work removal under bursts.
+
+Results are shared as is: callers must not modify them.
+"""
+import asyncio
+from functools import partial
+
+from metrics import COALESCED_READS
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, endpoint, key, call):
+        """Result of `call()` (a coroutine function), or of the identical call already in flight."""
+        key = (endpoint, key)
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._done, key))
+            COALESCED_READS.labels(endpoint, "leader").inc()
+        else:
+            COALESCED_READS.labels(endpoint, "coalesced").inc()
+        # A caller that goes away (client disconnect) does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def forget(self):
+        """Call after a write: later reads start a new call instead of joining one that may predate it."""
+        self._calls.clear()
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Marks the exception retrieved even when every caller has gone
+            task.exception()
@@ -0,0 +1,111 @@
+"""
+Library statistics kept in a single document of the meta collection.
+
+Writes to the games collection turn into `$inc` deltas on that document, so GET /stats is one
+point read instead of a `$facet` scan of the library. `recompute_stats` rebuilds it from
+scratch (at startup when it is missing, and from the admin endpoint to repair drift), under the
+lease of rebuilds.py.
+"""
+from collections import Counter
+
+STATS_DOCUMENT_ID = "stats"
+TOP_GENRES = 15
+
+
+def _field_key(name):
+    """Platform/genre names become field names: escape what Mongo would read as a path or operator."""
+    return str(name).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _field_name(key):
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def contribution(game):
+    """Counters a game adds to the stats document: nothing when it is missing or soft-deleted."""
+    counts = Counter()
+    if not game or game.get("deleted"):
+        return counts
+    counts["total"] += 1
+    if game.get("played"):
+        counts["played"] += 1
+    for platform in game.get("platforms") or []:
+        if platform:
+            counts[f"platforms.{_field_key(platform)}"] += 1
+    for genre in game.get("genres") or []:
+        if genre:
+            counts[f"genres.{_field_key(genre)}"] += 1
+    return counts
+
+
+def stats_delta(before, after):
+    """`$inc` document turning the stats of `before` into those of `after` (either may be None)."""
+    delta = Counter(contribution(after))
+    delta.subtract(contribution(before))
+    return {field: change for field, change in delta.items() if change}
+
+
+async def apply_delta(meta_collection, delta):
+    if delta:
+        await meta_collection.update_one({"_id": STATS_DOCUMENT_ID}, {"$inc": delta}, upsert=True)
+
+
+def stats_document(total, played, platforms, genres):
+    """Stats document from plain counts ({platform or genre name: games})."""
+    return {
+        "total": total,
+        "played": played,
+        "platforms": {_field_key(name): count for name, count in platforms.items() if name},
+        "genres": {_field_key(name): count for name, count in genres.items() if name},
+    }
+
+
+async def recompute_stats(games_collection, meta_collection):
+    """Rebuild the stats document from the games collection."""
+    pipeline = [
+        {"$match": {"deleted": False}},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "played": [{"$match": {"played": True}}, {"$count": "count"}],
+            "platforms": [
+                {"$unwind": "$platforms"},
+                {"$group": {"_id": "$platforms", "count": {"$sum": 1}}},
+            ],
+            "genres": [
+                {"$unwind": "$genres"},
+                {"$group": {"_id": "$genres", "count": {"$sum": 1}}},
+            ]
+        }}
+    ]
+    result = await games_collection.aggregate(pipeline).to_list(length=1)
+    facets = result[0]
+
+    doc = stats_document(
+        facets["total"][0]["count"] if facets["total"] else 0,
+        facets["played"][0]["count"] if facets["played"] else 0,
+        {item["_id"]: item["count"] for item in facets["platforms"]},
+        {item["_id"]: item["count"] for item in facets["genres"]},
+    )
+    await meta_collection.replace_one({"_id": STATS_DOCUMENT_ID}, doc, upsert=True)
+    return doc
+
+
+async def read_stats(meta_collection):
+    return await meta_collection.find_one({"_id": STATS_DOCUMENT_ID})
+
+
+def format_stats(doc):
+    """Shape of the GET /stats response: platforms by count, top genres only."""
+    def ranked(counts, limit=None):
+        items = sorted(
+            ((_field_name(key), count) for key, count in (counts or {}).items() if count > 0),
+            key=lambda item: -item[1],
+        )
+        return dict(items[:limit])
+
+    return {
+        "total": doc.get("total", 0),
+        "played_count": doc.get("played", 0),
+        "platforms": ranked(doc.get("platforms")),
+        "genres": ranked(doc.get("genres"), TOP_GENRES),
+    }
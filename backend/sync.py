@@ -0,0 +1,116 @@
+"""
+Delta sync for GET /games/changes.
+
+Every write stamps the games it creates, modifies or soft-deletes with `change_seq`, a number
+taken from a counter document of the meta collection (one atomic `$inc` per write, like the to play
+order counter). A client keeps the highest `change_seq` it has seen and asks only for the games
+above it: one range scan on an indexed field, whatever the size of the library.
+
+Numbers are allocated before the writes that use them, and a write can land after one with a
+higher number (other workers, batches, import chunks that are still reading the request body). So
+the counter document also lists the blocks still being written, and a sync only returns changes
+below the lowest of them (`sync_limit`): a client never moves past a write it has not seen yet.
+Scripts that write games without numbers invalidate syncs instead (see `invalidate_syncs`).
+"""
+import time
+from contextlib import asynccontextmanager
+
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+
+from archiving import ARCHIVE_DOCUMENT_ID
+
+# Counter document (in the meta collection) always at or above the highest change_seq
+COUNTER_ID = "change_seq"
+# Seconds after which a block still listed as being written is dropped (its worker died)
+PENDING_TTL = 300
+
+
+async def allocate_change_seqs(counters, count=1):
+    """
+    First of `count` consecutive unused sequence numbers, listed as being written until
+    `release_change_seqs` (prefer `change_seqs`, which releases them).
+    """
+    now = time.time()
+    counter = await counters.find_one_and_update(
+        {"_id": COUNTER_ID},
+        [
+            {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, count]}}},
+            {"$set": {"pending": {"$concatArrays": [
+                {"$filter": {
+                    "input": {"$ifNull": ["$pending", []]},
+                    "cond": {"$gte": ["$$this.at", now - PENDING_TTL]},
+                }},
+                [{"seq": {"$subtract": ["$seq", count - 1]}, "at": now}],
+            ]}}},
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["seq"] - count + 1
+
+
+async def release_change_seqs(counters, first):
+    """The block starting at `first` is written (or will not be)."""
+    await counters.update_one({"_id": COUNTER_ID}, {"$pull": {"pending": {"seq": first}}})
+
+
+@asynccontextmanager
+async def change_seqs(counters, count=1):
+    """Block of `count` new sequence numbers, listed as being written until the with block exits."""
+    first = await allocate_change_seqs(counters, count)
+    try:
+        yield first
+    finally:
+        await release_change_seqs(counters, first)
+
+
+async def sync_limit(counters):
+    """Highest change_seq a sync may return: every write numbered up to it has landed."""
+    counter = await counters.find_one({"_id": COUNTER_ID}) or {}
+    cutoff = time.time() - PENDING_TTL
+    pending = [entry["seq"] for entry in counter.get("pending", []) if entry["at"] >= cutoff]
+    return min(pending) - 1 if pending else counter.get("seq", 0)
+
+
+async def invalidate_syncs(counters):
+    """
+    Make every client sync again from since=0, for writes that did not stamp what they changed
+    (migration scripts): GET /games/changes answers 410 below archived_through, raised past them.
+    """
+    floor = await allocate_change_seqs(counters)
+    await release_change_seqs(counters, floor)
+    await counters.update_one({"_id": ARCHIVE_DOCUMENT_ID}, {"$max": {"change_seq": floor}}, upsert=True)
+
+
+async def seed_change_seq(collection, counters):
+    """Raise the counter to the highest stored change_seq (the meta collection may have been dropped)."""
+    highest = await collection.find_one(
+        {"change_seq": {"$exists": True}}, {"change_seq": 1}, sort=[("change_seq", DESCENDING)]
+    )
+    await counters.update_one(
+        {"_id": COUNTER_ID},
+        {"$max": {"seq": highest["change_seq"] if highest else 0}},
+        upsert=True,
+    )
+
+
+async def backfill_change_seqs(collection, counters, batch_size=500):
+    """Stamp games stored before change sequences existed (or inserted by scripts), so they sync once."""
+    object_ids = [game["_id"] async for game in collection.find({"change_seq": {"$exists": False}}, {"_id": 1})]
+    for start in range(0, len(object_ids), batch_size):
+        batch = object_ids[start:start + batch_size]
+        async with change_seqs(counters, len(batch)) as first:
+            await collection.bulk_write(
+                [
+                    UpdateOne({"_id": object_id}, {"$set": {"change_seq": first + offset}})
+                    for offset, object_id in enumerate(batch)
+                ],
+                ordered=False,
+            )
+    return len(object_ids)
+
+
+async def changes_since(collection, since, until, projection, limit):
+    """Games stamped after `since` and up to `until` in change order, one more than `limit` when there are more."""
+    cursor = collection.find({"change_seq": {"$gt": since, "$lte": until}}, projection).sort("change_seq", 1)
+    return await cursor.limit(limit + 1).to_list(length=limit + 1)
@@ -0,0 +1,67 @@
+"""Chunk boundaries in the streaming JSON array parser (run with pytest from backend/)."""
+import asyncio
+
+import pytest
+
+from importing import ImportFormatError, iter_json_array
+
+
+async def _chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def parse(data, size=1):
+    async def collect():
+        return [record async for record in iter_json_array(_chunks(data, size))]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1024])
+def test_elements_survive_any_chunk_boundary(size):
+    data = '[{"title": "Café"}, 12, -3.5e2, true, null, "a,b]", [1, 2]]  \n'.encode("utf-8")
+    assert parse(data, size) == [
+        (1, {"title": "Café"}), (2, 12), (3, -350.0), (4, True), (5, None), (6, "a,b]"), (7, [1, 2]),
+    ]
+
+
+def test_number_cut_by_a_chunk_boundary_is_one_record():
+    assert parse(b"[1, 12, 345]") == [(1, 1), (2, 12), (3, 345)]
+
+
+def test_empty_array():
+    assert parse(b" [ ] ") == []
+
+
+@pytest.mark.parametrize("data", [
+    b'[{"a": 1} {"b": 2}]',  # missing comma
+    b'[{"a": 1}] {"b": 2}',  # data after the array
+    b'[{"a": 1},]',  # trailing comma
+    b'[, {"a": 1}]',
+    b'[{"a": 1}',  # unterminated
+    b'{"a": 1}',  # not an array
+])
+def test_malformed_arrays_are_rejected(data):
+    with pytest.raises(ImportFormatError):
+        parse(data)
+
+
+@pytest.mark.parametrize("size", [1, 4, 1024])
+def test_invalid_element_fails_before_the_rest_is_read(size):
+    data = b'[{"title": "A"}, {"title": bad}, '
+
+    async def body():
+        async for chunk in _chunks(data, size):
+            yield chunk
+        raise AssertionError("read past the invalid element")
+
+    async def collect():
+        return [record async for record in iter_json_array(body())]
+    with pytest.raises(ImportFormatError):
+        asyncio.run(collect())
+
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+def test_literals_and_escapes_cut_by_a_chunk_boundary(size):
+    data = '[true, false, null, "\\u00e9\\ud83d\\ude00"]'.encode("utf-8")
+    assert parse(data, size) == [(1, True), (2, False), (3, None), (4, "é\U0001F600")]
@@ -0,0 +1,40 @@
+"""Folding and tokenizing of titles and queries (run with pytest from backend/)."""
+import pytest
+
+from search import MAX_QUERY_TOKENS, MAX_TOKEN_LENGTH, fold, query_tokens, search_fields
+
+
+@pytest.mark.parametrize("text, folded", [
+    ("Pokémon: Édition", "pokemon edition"),
+    ("  The Witcher 3 - Wild_Hunt ", "the witcher 3 wild hunt"),
+    ("Ведьмак 3", "ведьмак 3"),
+    ("Ørsted", "ørsted"),
+    ("ファイナルファンタジー", "ファイナルファンタシー"),
+    ("STRASSE", "strasse"),
+    ("Straße", "strasse"),
+    ("", ""),
+    (None, ""),
+])
+def test_fold(text, folded):
+    assert fold(text) == folded
+
+
+def test_query_tokens_longest_first_and_bounded():
+    assert query_tokens("the Witcher  3") == ["witcher", "the", "3"]
+    assert query_tokens("!!!") == []
+    assert query_tokens("a" * 50) == ["a" * MAX_TOKEN_LENGTH]
+    assert len(query_tokens(" ".join(f"w{i}" for i in range(20)))) == MAX_QUERY_TOKENS
+
+
+def test_non_latin_titles_are_searchable():
+    fields = search_fields("Ведьмак 3", "ファイナルファンタジー")
+    for query in ("Ведь", "ведьмак 3", "ファイナル"):
+        assert set(query_tokens(query)) <= set(fields["search_tokens"])
+
+
+def test_search_fields():
+    fields = search_fields("Pokémon Red", "Pocket Monsters")
+    assert fields["search_key"] == "pocket monsters"
+    assert {"p", "po", "pok", "pokemon", "r", "red", "pocket", "monsters"} <= set(fields["search_tokens"])
+    assert fields["search_tokens"] == sorted(fields["search_tokens"])
+    assert search_fields("Ørsted")["search_key"] == "ørsted"
@@ -0,0 +1,40 @@
+"""
+Warm startup. Before a worker reports ready (GET /ready) it opens its MongoDB connections, reads
+the hot indexes into the server cache and runs the first reads of the UI (see main.lifespan), so
+the first requests after a deploy or a rolling restart pay for none of it.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from profiling import UNLOGGED_COMMENT
+
+logger = logging.getLogger("gameslist.warmup")
+
+# Connections the driver opens at startup and keeps open (minPoolSize)
+MIN_POOL_SIZE = int(os.getenv("GAMES_MONGO_MIN_POOL_SIZE", "10"))
+
+
+async def prime_pool(database, size=MIN_POOL_SIZE):
+    """Server selection, handshakes and `size` pooled connections, opened by concurrent pings."""
+    started = time.monotonic()
+    await asyncio.gather(*(database.command("ping") for _ in range(max(size, 1))))
+    logger.info("Opened MongoDB connections in %.0f ms", (time.monotonic() - started) * 1000)
+
+
+async def touch_indexes(collection, declared):
+    """
+    Scan every declared index once so its pages are in the WiredTiger cache (the `touch` command
+    is gone since MongoDB 4.4). A partial index is scanned with its own filter. These scans are slow
+    by design: they stay out of the slow query log.
+    """
+    started = time.monotonic()
+    for model in declared:
+        document = model.document
+        await collection.count_documents(
+            document.get("partialFilterExpression", {}), hint=document["name"], comment=UNLOGGED_COMMENT
+        )
+    logger.info(
+        "Read %d indexes of %s in %.0f ms", len(declared), collection.name, (time.monotonic() - started) * 1000
+    )
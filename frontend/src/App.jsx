@@ -1,5 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import api from './api';
+import { subscribeToChanges, isFollowingChanges } from './events';
 import GameGrid from './components/GameGrid';
 import GameForm from './components/GameForm';
 import GameDetailModal from './components/GameDetailModal';
@@ -9,6 +10,14 @@ import ToPlayList from './components/ToPlayList';
 import { Pencil, Plus, Dice5, Download, BarChart2, ListTodo } from 'lucide-react';
 import './index.css';
 
+const PLATFORMS = ['Steam', 'Amazon', 'Epic', 'GOG', 'Microsoft', 'EA'];
+
+// "Steam (120)" once the facet counts are known
+const withCount = (label, count) => (count === undefined ? label : `${label} (${count})`);
+
+// Fields the list filters on: a change to them can move a game in or out of the list
+const FILTERED_FIELDS = ['title', 'custom_title', 'platforms', 'genres', 'played', 'is_dlc'];
+
 function App() {
     const [games, setGames] = useState([]);
     const [loading, setLoading] = useState(true);
@@ -28,15 +37,40 @@ function App() {
     const [detailGame, setDetailGame] = useState(null);
     const [isDetailModalOpen, setIsDetailModalOpen] = useState(false);
     const [totalGames, setTotalGames] = useState(0);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [facets, setFacets] = useState(null);
+
+    // Same filters as GET /games, without paging
+    const filterParams = () => {
+        const params = { include_dlc: filters.includeDLC };
+        if (filters.search) params.search = filters.search;
+        if (filters.platform !== 'all') params.platform = filters.platform;
+        if (filters.genre !== 'all') params.genre = filters.genre;
+        if (filters.played !== 'all') params.played = filters.played === 'true';
+        return params;
+    };
+
+    // Counts per platform/genre/status under the current filters, for the dropdowns
+    const fetchFacets = async () => {
+        try {
+            const response = await api.get('/games/facets', { params: filterParams() });
+            setFacets(response.data);
+        } catch (error) {
+            console.error("Error fetching facets:", error);
+        }
+    };
 
     // Load Games
     const fetchGames = async (isLoadMore = false) => {
         setLoading(true);
+        if (!isLoadMore) fetchFacets();
         try {
-            const params = {
-                limit: 100,
-                skip: isLoadMore ? games.length : 0
-            };
+            // Cards only need the summary; full details are loaded when a game is opened
+            const params = { limit: 100, fields: 'summary' };
+            // Keyset pagination: continue after the last game of the previous page
+            if (isLoadMore && nextCursor) params.cursor = nextCursor;
+            // The total does not change between pages of the same filter
+            if (isLoadMore) params.include_total = false;
 
             if (filters.search) params.search = filters.search;
             if (filters.platform !== 'all') params.platform = filters.platform;
@@ -46,10 +80,11 @@ function App() {
 
             const response = await api.get('/games', { params });
 
-            // Response structure: { items: [], total: 1000, skip: 0, limit: 100 }
+            // Response structure: { items: [], total: 1000, skip: 0, limit: 100, next_cursor: '...' }
             const newGames = response.data.items;
             
-            setTotalGames(response.data.total);
+            if (response.data.total !== null) setTotalGames(response.data.total);
+            setNextCursor(response.data.next_cursor);
 
             if (isLoadMore) {
                 setGames(prev => [...prev, ...newGames]);
@@ -79,6 +114,52 @@ function App() {
         fetchGames(false);
     }, [filters]);
 
+    // Patch the loaded games from a change event (see events.js); reload the list when
+    // a change may move games in or out of it. Kept in a ref so it sees the current state.
+    const applyChange = useRef(null);
+    applyChange.current = (change) => {
+        const loaded = new Set(games.map(g => g._id));
+        const filtered = filters.search || filters.platform !== 'all' || filters.genre !== 'all' || filters.played !== 'all';
+        const needsReload = change.reload || change.games.some(({ id, fields }) => (
+            fields
+                ? Object.keys(fields).some(f => FILTERED_FIELDS.includes(f)) && (filtered || !loaded.has(id))
+                : !loaded.has(id)
+        ));
+        if (needsReload) {
+            fetchGames(false);
+            return;
+        }
+        fetchFacets();
+
+        const deleted = new Set();
+        const updates = new Map();
+        change.games.forEach(({ id, fields, deleted: isDeleted }) => {
+            if (isDeleted) deleted.add(id);
+            else updates.set(id, { ...updates.get(id), ...fields });
+        });
+        setGames(prev => prev
+            .filter(g => !deleted.has(g._id))
+            .map(g => (updates.has(g._id) ? { ...g, ...updates.get(g._id) } : g)));
+        if (deleted.size) setTotalGames(prev => prev - deleted.size);
+    };
+
+    useEffect(() => subscribeToChanges(change => applyChange.current(change)), []);
+
+    // After our own writes: the change feed updates the list, unless it is not connected
+    const reloadUnlessFollowing = () => {
+        if (!isFollowingChanges()) fetchGames(false);
+    };
+
+    // Streamed by the backend: the browser downloads it directly, whatever the library size
+    const exportGames = () => {
+        const params = new URLSearchParams({ format: 'json', include_dlc: filters.includeDLC });
+        if (filters.search) params.set('search', filters.search);
+        if (filters.platform !== 'all') params.set('platform', filters.platform);
+        if (filters.genre !== 'all') params.set('genre', filters.genre);
+        if (filters.played !== 'all') params.set('played', filters.played === 'true');
+        window.location.href = `${api.defaults.baseURL}/games/export?${params}`;
+    };
+
     const handleFilterChange = (key, value) => {
         setFilters(prev => ({ ...prev, [key]: value }));
     };
@@ -93,8 +174,19 @@ function App() {
         }
     };
 
-    const openGameForm = (game) => {
-        setEditingGame(game);
+    // Grid items are summaries: fetch the whole document (description, notes...) before showing it
+    const loadFullGame = async (game) => {
+        try {
+            const response = await api.get(`/games/${game._id}`);
+            return response.data;
+        } catch (error) {
+            console.error("Failed to load game details", error);
+            return game;
+        }
+    };
+
+    const openGameForm = async (game) => {
+        setEditingGame(game ? await loadFullGame(game) : null);
         setIsModalOpen(true);
     };
 
@@ -103,9 +195,10 @@ function App() {
         setIsModalOpen(false);
     };
 
-    const openDetailModal = (game) => {
+    const openDetailModal = async (game) => {
         setDetailGame(game);
         setIsDetailModalOpen(true);
+        setDetailGame(await loadFullGame(game));
     };
 
     const closeDetailModal = () => {
@@ -126,7 +219,7 @@ function App() {
                 await api.post('/games', gameData);
             }
             closeGameForm();
-            fetchGames(false); // Reload all
+            reloadUnlessFollowing();
         } catch (error) {
             console.error("Failed to save game", error);
             alert("Error saving game");
@@ -139,7 +232,7 @@ function App() {
         try {
             await api.delete(`/games/${game._id}`);
             closeGameForm();
-            fetchGames(false); // Reload all
+            reloadUnlessFollowing();
         } catch (error) {
             console.error("Failed to delete game", error);
             alert("Error deleting game");
@@ -166,12 +259,9 @@ function App() {
                         onChange={(e) => handleFilterChange('platform', e.target.value)}
                     >
                         <option value="all">All Platforms</option>
-                        <option value="Steam">Steam</option>
-                        <option value="Amazon">Amazon</option>
-                        <option value="Epic">Epic</option>
-                        <option value="GOG">GOG</option>
-                        <option value="Microsoft">Microsoft</option>
-                        <option value="EA">EA</option>
+                        {PLATFORMS.map(p => (
+                            <option key={p} value={p}>{withCount(p, facets ? facets.platforms[p] || 0 : undefined)}</option>
+                        ))}
                     </select>
 
                     <select
@@ -180,7 +270,12 @@ function App() {
                         onChange={(e) => handleFilterChange('genre', e.target.value)}
                     >
                         <option value="all">All Genres</option>
-                        {genres.map(g => <option key={g} value={g}>{g}</option>)}
+                        {(facets ? Object.keys(facets.genres).sort() : genres).map(g => (
+                            <option key={g} value={g}>{withCount(g, facets ? facets.genres[g] : undefined)}</option>
+                        ))}
+                        {facets && filters.genre !== 'all' && !(filters.genre in facets.genres) && (
+                            <option value={filters.genre}>{withCount(filters.genre, 0)}</option>
+                        )}
                     </select>
 
                     <select
@@ -189,8 +284,8 @@ function App() {
                         onChange={(e) => handleFilterChange('played', e.target.value)}
                     >
                         <option value="all">All Status</option>
-                        <option value="true">Played</option>
-                        <option value="false">Not Played</option>
+                        <option value="true">{withCount('Played', facets ? facets.played.played : undefined)}</option>
+                        <option value="false">{withCount('Not Played', facets ? facets.played.not_played : undefined)}</option>
                     </select>
 
                     <label style={{ 
@@ -223,7 +318,7 @@ function App() {
                         <span>Random</span>
                     </button>
 
-                    <button className="btn-export">
+                    <button className="btn-export" onClick={exportGames}>
                         <Download size={18} />
                         <span>Export</span>
                     </button>
@@ -252,7 +347,7 @@ function App() {
                 onViewDetails={openDetailModal}
             />
 
-            {games.length < totalGames && (
+            {nextCursor && (
                 <div style={{ display: 'flex', justifyContent: 'center', margin: '30px 0 80px 0' }}>
                     <button
                         className="btn-action"
@@ -278,7 +373,7 @@ function App() {
                 />
             )}
 
-            {statsOpen && <StatsModal onClose={() => setStatsOpen(false)} />}
+            {statsOpen && <StatsModal filterParams={filterParams()} onClose={() => setStatsOpen(false)} />}
 
             {randomOpen && (
                 <RandomGameModal
@@ -291,7 +386,7 @@ function App() {
                 <ToPlayList
                     isOpen={toPlayOpen}
                     onClose={() => setToPlayOpen(false)}
-                    onUpdate={() => fetchGames(false)}
+                    onUpdate={reloadUnlessFollowing}
                 />
             )}
 
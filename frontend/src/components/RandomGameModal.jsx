@@ -1,25 +1,48 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import api from '../api';
 import { X, Dice5, Calendar, Gamepad2, Star } from 'lucide-react';
 import GameCard from './GameCard';
 
+// Games fetched per request; rerolls are served from this batch
+const BATCH_SIZE = 10;
+// Recently shown games are excluded from the next batch (bounded to keep the URL short)
+const MAX_EXCLUDED = 100;
+
 const RandomGameModal = ({ onClose, filters }) => {
     const [game, setGame] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    const queue = useRef([]);
+    const shown = useRef([]);
+
+    const fetchBatch = async () => {
+        const params = { count: BATCH_SIZE };
+        if (filters.search) params.search = filters.search;
+        if (filters.platform !== 'all') params.platform = filters.platform;
+        if (filters.genre !== 'all') params.genre = filters.genre;
+        if (filters.played !== 'all') params.played = filters.played === 'true';
+        if (shown.current.length) params.exclude = shown.current.join(',');
+
+        const res = await api.get('/games/random', { params });
+        if (res.data.length === 0 && shown.current.length) {
+            // Every matching game has been shown: start over
+            shown.current = [];
+            return fetchBatch();
+        }
+        return res.data;
+    };
 
     const fetchRandom = async () => {
-        setLoading(true);
         setError(null);
         try {
-            const params = {};
-            if (filters.search) params.search = filters.search;
-            if (filters.platform !== 'all') params.platform = filters.platform;
-            if (filters.genre !== 'all') params.genre = filters.genre;
-            if (filters.played !== 'all') params.played = filters.played === 'true';
-
-            const res = await api.get('/games/random', { params });
-            setGame(res.data);
+            if (queue.current.length === 0) {
+                setLoading(true);
+                queue.current = await fetchBatch();
+            }
+            const next = queue.current.shift();
+            if (!next) throw new Error("No games found");
+            shown.current = [...shown.current, next._id].slice(-MAX_EXCLUDED);
+            setGame(next);
         } catch (err) {
             console.error("Failed to fetch random game", err);
             setError("No games found matching your current filters.");
@@ -2,15 +2,30 @@ import React, { useEffect, useState } from 'react';
 import api from '../api';
 import { X, PieChart, Layers, Monitor, CheckCircle } from 'lucide-react';
 
-const StatsModal = ({ onClose }) => {
+// Facet counts of the current filter (GET /games/facets) in the shape of GET /stats
+const facetsAsStats = (facets) => ({
+    total: facets.total,
+    played_count: facets.played.played,
+    platforms: facets.platforms,
+    genres: facets.genres,
+});
+
+const StatsModal = ({ onClose, filterParams }) => {
     const [stats, setStats] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [scope, setScope] = useState('library');
 
     useEffect(() => {
         const fetchStats = async () => {
+            setLoading(true);
             try {
-                const res = await api.get('/stats');
-                setStats(res.data);
+                if (scope === 'filter') {
+                    const res = await api.get('/games/facets', { params: filterParams });
+                    setStats(facetsAsStats(res.data));
+                } else {
+                    const res = await api.get('/stats');
+                    setStats(res.data);
+                }
             } catch (err) {
                 console.error("Failed to load stats", err);
             } finally {
@@ -18,7 +33,7 @@ const StatsModal = ({ onClose }) => {
             }
         };
         fetchStats();
-    }, []);
+    }, [scope]);
 
     if (!stats && !loading) return null;
 
@@ -30,6 +45,17 @@ const StatsModal = ({ onClose }) => {
                     <PieChart /> Library Statistics
                 </h2>
 
+                {filterParams && (
+                    <div style={{ display: 'flex', gap: '10px', marginBottom: '20px' }}>
+                        <button className="btn-action" style={{ background: scope === 'library' ? '#ff4785' : 'transparent', border: '1px solid #fff' }} onClick={() => setScope('library')}>
+                            Entire Library
+                        </button>
+                        <button className="btn-action" style={{ background: scope === 'filter' ? '#ff4785' : 'transparent', border: '1px solid #fff' }} onClick={() => setScope('filter')}>
+                            Current Filter
+                        </button>
+                    </div>
+                )}
+
                 {loading ? (
                     <p>Loading statistics...</p>
                 ) : (
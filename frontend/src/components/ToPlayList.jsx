@@ -1,11 +1,13 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import api from '../api';
+import { subscribeToChanges } from '../events';
 import { X, GripVertical, Trash2 } from 'lucide-react';
 
 const ToPlayList = ({ isOpen, onClose, onUpdate }) => {
     const [games, setGames] = useState([]);
     const [loading, setLoading] = useState(true);
     const [draggedIndex, setDraggedIndex] = useState(null);
+    const [dragStartIndex, setDragStartIndex] = useState(null);
 
     useEffect(() => {
         if (isOpen) {
@@ -13,6 +15,28 @@ const ToPlayList = ({ isOpen, onClose, onUpdate }) => {
         }
     }, [isOpen]);
 
+    // Follow changes while open: patch orders and removals, reload when a game joins the list
+    const listed = useRef(games);
+    listed.current = games;
+    useEffect(() => {
+        if (!isOpen) return undefined;
+        return subscribeToChanges(change => {
+            const ids = new Set(listed.current.map(g => g._id));
+            if (change.reload || change.games.some(({ id, fields }) => fields && fields.to_play && !ids.has(id))) {
+                fetchToPlayGames();
+                return;
+            }
+            const removed = new Set(change.games
+                .filter(({ fields, deleted }) => deleted || (fields && fields.to_play === false))
+                .map(({ id }) => id));
+            const updates = new Map(change.games.filter(({ fields }) => fields).map(({ id, fields }) => [id, fields]));
+            setGames(prev => prev
+                .filter(g => !removed.has(g._id))
+                .map(g => (updates.has(g._id) ? { ...g, ...updates.get(g._id) } : g))
+                .sort((a, b) => (a.to_play_order - b.to_play_order) || a._id.localeCompare(b._id)));
+        });
+    }, [isOpen]);
+
     const fetchToPlayGames = async () => {
         setLoading(true);
         try {
@@ -27,6 +51,7 @@ const ToPlayList = ({ isOpen, onClose, onUpdate }) => {
 
     const handleDragStart = (e, index) => {
         setDraggedIndex(index);
+        setDragStartIndex(index);
         e.dataTransfer.effectAllowed = 'move';
     };
 
@@ -47,17 +72,25 @@ const ToPlayList = ({ isOpen, onClose, onUpdate }) => {
     const handleDragEnd = async () => {
         if (draggedIndex === null) return;
         
-        // Save new order to backend
-        const gameIds = games.map(g => g._id);
-        try {
-            await api.put('/games/to-play/reorder', gameIds);
-            onUpdate && onUpdate();
-        } catch (error) {
-            console.error("Error reordering games:", error);
-            fetchToPlayGames(); // Reload on error
+        // Save the move to backend: only the dragged game gets a new position, between its new neighbours
+        if (draggedIndex !== dragStartIndex) {
+            const moved = games[draggedIndex];
+            const after = games[draggedIndex - 1];
+            const before = games[draggedIndex + 1];
+            try {
+                await api.put(`/games/${moved._id}/to-play/move`, {
+                    after_id: after ? after._id : null,
+                    before_id: before ? before._id : null
+                });
+                onUpdate && onUpdate();
+            } catch (error) {
+                console.error("Error reordering games:", error);
+                fetchToPlayGames(); // Reload on error
+            }
         }
         
         setDraggedIndex(null);
+        setDragStartIndex(null);
     };
 
     const handleRemoveFromList = async (game) => {
@@ -0,0 +1,29 @@
+import api from './api';
+
+// Library change feed (GET /events), one EventSource shared by every subscriber.
+// Listeners get { version, games: [{ id, fields } | { id, deleted: true }] },
+// or { reload: true } when the changed games are unknown or events were missed.
+const listeners = new Set();
+let source = null;
+
+const notify = (change) => listeners.forEach(listener => listener(change));
+
+export const subscribeToChanges = (listener) => {
+    listeners.add(listener);
+    if (!source) {
+        // EventSource reconnects by itself, sending the last event id to resume from
+        source = new EventSource(`${api.defaults.baseURL}/events`);
+        source.addEventListener('change', (e) => notify(JSON.parse(e.data)));
+        source.addEventListener('reset', () => notify({ reload: true }));
+    }
+    return () => {
+        listeners.delete(listener);
+        if (listeners.size === 0 && source) {
+            source.close();
+            source = null;
+        }
+    };
+};
+
+// Whether changes are currently arriving: when not, callers reload after their own writes
+export const isFollowingChanges = () => source !== null && source.readyState === EventSource.OPEN;